@@ -1,19 +1,57 @@
 #Import Necessary Libraries
 from dotenv import load_dotenv # To load environment variables from .env file
 import os # To access environment variables
-from flask import Flask, render_template, request
+from flask import Flask, Response, jsonify, render_template, request
 
 # Import Open AI
 import openai
 
-# Import Python Requests Library for use in API calls
-import requests
+# Import the shared pooled HTTP client used for every API call
+import upstream
+# Import the optional background warm-up / upstream self-check
+import warmup
+# Import the Prometheus-style metrics (upstream timings, answer timings)
+import metrics
+# Import the per-request time budget for the optional joke/fact decorations
+import deadline
+# Import the per-answer memo of upstream calls and its dead-work report
+import request_scope
 # Import random for random selections
 import random
-# Import personality json for personality traits
-import json
+# Import the compiled, hot-reloading personality traits
+from personality import PersonalityFile
 #Import re for regex operations so we can match whole words
 import re
+# Import the fan-out helpers so independent API calls run in parallel (threads or asyncio)
+from fanout import (FANOUT_TIMEOUT, gather, iter_ready, map_bounded, map_bounded_async, run_parallel,
+                    run_parallel_async, submit_all)
+# Import asyncio and partial for the async request path
+import asyncio
+from functools import partial
+# Import time for the streaming deadline
+import time
+# Import threading for the optional background warm-up jobs
+import threading
+# Import the shared TTL/LRU cache for repeat upstream lookups
+from cache import TTLCache, cache_stats
+# Import the on-disk geocoding store so cities are only geocoded once
+from geocode_store import GeocodeStore, normalize_location
+# Import the on-disk store of Wikipedia summary sentences
+from wiki_store import WikiSentenceStore
+# Import the merged, parallel book search
+from book_search import BOOKS_WANTED, acollect_books, collect_books
+# Import the local snapshot of TMDb discover results
+from movie_catalog import CatalogRefresher, MovieCatalog, catalog_slices
+# Import the per-city event store and its pre-warmer
+from event_store import EventPrewarmer, EventStore
+# Import the local TheMealDB recipe index
+from meal_index import MealIndex
+# Import the spatial cache for place searches
+from place_cache import PlaceCache, snap_to_cell
+# Import the precompiled intent router
+from router import IntentRouter
+# Import the background joke buffer
+from joke_buffer import JokeReservoir
 
 load_dotenv(override=True)  # Load environment variables from .env file
 
@@ -26,26 +64,32 @@ openai.api_key = os.getenv("OPENAI_API_KEY")
 # Test OMDb API key (optional, for debugging)
 # url = "http://www.omdbapi.com/"
 # params = {"apikey": OMDB_API_KEY, "t": "Inception"}
-# response = requests.get(url, params=params)
+# response = upstream.get(url, params=params)
 # print(response.json())
 
 
-# Load personality traits from JSON file
-with open('personality.json') as f:
-    PERSONALITY = json.load(f)
+# Folder this file lives in, so data files load no matter where the app is started from
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
-import requests
-url = "https://v2.jokeapi.dev/joke/Misc,Pun?type=single&safe-mode"
-response = requests.get(url, timeout=5)
-print(response.status_code)
-print(response.json())
+# Load personality traits from JSON file, compiled for fast lookups (see personality.py).
+# PERSONALITY is swapped for a fresh copy whenever the file is edited.
+PERSONALITY_FILE = PersonalityFile(os.path.join(BASE_DIR, "personality.json"))
+PERSONALITY = PERSONALITY_FILE.current
 
-import requests
-url = "https://www.googleapis.com/books/v1/volumes"
-params = {"q": "subject:fiction", "maxResults": 5}
-response = requests.get(url, params=params)
-print(response.status_code)
-print(response.json())
+# Upstream self-checks for the optional warm-up (name -> (url, params)).
+# Nothing here runs at import time; see start_warmup at the bottom of the file.
+UPSTREAM_HEALTH_CHECKS = {
+    "jokeapi": ("https://v2.jokeapi.dev/joke/Misc,Pun", {"type": "single", "safe-mode": ""}),
+    "google_books": ("https://www.googleapis.com/books/v1/volumes", {"q": "subject:fiction", "maxResults": 1}),
+    "openlibrary": ("https://openlibrary.org/search.json", {"subject": "fiction", "limit": 1}),
+    "wikipedia": ("https://en.wikipedia.org/api/rest_v1/page/summary/Movie", None),
+    "themealdb": ("https://www.themealdb.com/api/json/v1/1/filter.php", {"i": "chicken"}),
+    "openbrewerydb": ("https://api.openbrewerydb.org/v1/breweries", {"per_page": 1}),
+    "tmdb": ("https://api.themoviedb.org/3/configuration", {"api_key": TMDB_API_KEY}),
+    "omdb": ("http://www.omdbapi.com/", {"apikey": OMDB_API_KEY, "t": "Inception"}),
+    "ticketmaster": ("https://app.ticketmaster.com/discovery/v2/events.json", {"apikey": TICKETMASTER_CONSUMER_KEY, "size": 1}),
+    "geoapify": ("https://api.geoapify.com/v1/geocode/search", {"text": "Dallas", "apiKey": GEOAPIFY_API_KEY}),
+}
 
 def ask_chatgpt(prompt):
     response = openai.ChatCompletion.create(
@@ -54,76 +98,136 @@ def ask_chatgpt(prompt):
     )
     return response.choices[0].message['content']
 
-import requests
-import re
-
-def get_wiki_fact(topic):
+# Function to get a fact from the personality file (no network), or "" if it has none for the topic
+def get_local_fact(topic, intro=None):
     topic_key = topic.lower().replace("_", " ")
+    custom_facts = PERSONALITY.custom_facts(topic_key)
+    if not custom_facts:
+        return ""
+    if intro is None:
+        intro = pick_fact_intro(topic_key)
+    return f"{intro} {random.choice(custom_facts)}"
+
+# Function to pick an intro for a fact about a topic
+def pick_fact_intro(topic_key):
     # Get intros for the topic, or default
-    intros = PERSONALITY.get("fact_intros", {}).get(topic_key, []) + PERSONALITY.get("fact_intros", {}).get("default", [
+    intros = PERSONALITY.fact_intros(topic_key) or (
         "Here's a fun fact:",
         "Did you know?",
         "Let me hit you with some trivia:",
         "While we're on the subject:"
-    ])
-    intro = random.choice(intros)
-    # Wikipedia API
+    )
+    return random.choice(intros)
+
+# Sentences of Wikipedia summaries, by topic (see wiki_store.py)
+WIKI_STORE = WikiSentenceStore()
+
+# Generic topics the intents fall back to for their fact; seeded by the optional warm-up
+WIKI_SEED_TOPICS = ["restaurant", "event", "tourism", "brewery", "recipe", "movie", "book"]
+
+# Function to fetch a topic's Wikipedia summary, split it into sentences and
+# store them. Returns the sentences, or None if there are none.
+@upstream.fetcher
+def fetch_wiki_sentences(topic, timeout=5, retry=True):
     topic_api = topic.replace(" ", "_")
     url = f"https://en.wikipedia.org/api/rest_v1/page/summary/{topic_api}"
     headers = {
         "User-Agent": "Activabot/1.0 (https://yourdomain.com/; contact@example.com)"
     }
-    try:
-        response = requests.get(url, headers=headers, timeout=5)
-        print(f"Wikipedia API URL: {url} | Status: {response.status_code}")
-        if response.status_code == 200:
-            data = response.json()
-            extract = data.get("extract")
-            if extract:
-                # Split extract into sentences and pick one at random
-                sentences = re.split(r'(?<=[.!?]) +', extract)
-                fact = random.choice([s for s in sentences if len(s.strip()) > 0])
-                return f"{intro} {fact}"
-        # Optionally, add your own custom facts for more variety
-        custom_facts = PERSONALITY.get("custom_facts", {}).get(topic_key, [])
-        if custom_facts:
-            return f"{intro} {random.choice(custom_facts)}"
-        return ""
-    except Exception as e:
-        print("Wikipedia API error:", e)
-        return ""
+    response = yield upstream.request(url, headers=headers, timeout=timeout, retry=retry)
+    print(f"Wikipedia API URL: {url} | Status: {response.status_code}")
+    if response.status_code == 404:
+        # No page for this topic: remember that for a while
+        WIKI_STORE.put(topic, None)
+        return None
+    if response.status_code != 200:
+        return None
+    extract = response.json().get("extract")
+    # Split extract into sentences once; every later fact is a random pick
+    sentences = [s for s in re.split(r'(?<=[.!?]) +', extract or "") if len(s.strip()) > 0]
+    WIKI_STORE.put(topic, sentences or None)
+    return sentences or None
+
+@upstream.fetcher
+def get_wiki_fact(topic):
+    topic_key = topic.lower().replace("_", " ")
+    intro = pick_fact_intro(topic_key)
+    found, sentences = WIKI_STORE.get(topic)
+    if not found:
+        # The fact is optional: once the request's time budget is nearly spent, use a local one
+        if deadline.running_low():
+            return get_local_fact(topic, intro)
+        try:
+            sentences = yield from fetch_wiki_sentences.steps(topic, timeout=deadline.clamp(5), retry=False)
+        except Exception as e:
+            print("Wikipedia API error:", e)
+            return get_local_fact(topic, intro)
+    if sentences:
+        return f"{intro} {random.choice(sentences)}"
+    # Optionally, add your own custom facts for more variety
+    return get_local_fact(topic, intro)
+
+# Function to fill the Wikipedia store with the generic fallback topics (skips fresh ones)
+def seed_wiki_store():
+    for topic in WIKI_SEED_TOPICS:
+        found, sentences = WIKI_STORE.get(topic)
+        if found:
+            continue
+        try:
+            fetch_wiki_sentences(topic)
+        except Exception as e:
+            print("Wikipedia seed failed:", topic, e)
+
+# Function to get a Wikipedia fact, falling back to a generic topic if the first one has none
+@upstream.fetcher
+def get_wiki_fact_or(topic, fallback_topic):
+    return (yield from get_wiki_fact.steps(topic)) or (yield from get_wiki_fact.steps(fallback_topic))
+
+# Custom topic jokes
+CUSTOM_JOKES = {
+    "restaurant": [
+        "Why did the tomato turn red? Because it saw the salad dressing!",
+        "I asked the waiter for the soup of the day. He said, 'Whiskey.'",
+    ],
+    "book": [
+        "Why are books always cold? Because they have so many fans!",
+        "I’m reading a book on anti-gravity. It’s impossible to put down!",
+    ],
+    # Add more topics as needed
+}
+# Every custom joke, used when the JokeAPI buffer is empty
+ALL_CUSTOM_JOKES = [joke for jokes in CUSTOM_JOKES.values() for joke in jokes]
+
+# Function to fetch a batch of jokes from JokeAPI (used by the background joke buffer)
+def fetch_joke_batch(amount=10):
+    url = "https://v2.jokeapi.dev/joke/Misc,Pun"
+    params = {"type": "single", "safe-mode": "", "amount": amount}
+    response = upstream.get(url, params=params, timeout=5)
+    if response.status_code != 200:
+        return []
+    data = response.json()
+    # JokeAPI returns {"jokes": [...]} for amount > 1 and a single joke otherwise
+    jokes = data.get("jokes", [data])
+    return [joke.get("joke") for joke in jokes if joke.get("joke")]
+
+# Jokes prefetched in the background so get_random_joke never waits on JokeAPI
+JOKE_RESERVOIR = JokeReservoir(fetch_joke_batch)
 
 def get_random_joke(topic=None):
-    # Custom topic jokes
-    custom_jokes = {
-        "restaurant": [
-            "Why did the tomato turn red? Because it saw the salad dressing!",
-            "I asked the waiter for the soup of the day. He said, 'Whiskey.'",
-        ],
-        "book": [
-            "Why are books always cold? Because they have so many fans!",
-            "I’m reading a book on anti-gravity. It’s impossible to put down!",
-        ],
-        # Add more topics as needed
-    }
-    if topic and topic.lower() in custom_jokes:
-        return random.choice(custom_jokes[topic.lower()])
-    # Fallback to JokeAPI
-    url = "https://v2.jokeapi.dev/joke/Misc,Pun?type=single&safe-mode"
-    try:
-        response = requests.get(url, timeout=5)
-        if response.status_code == 200:
-            data = response.json()
-            joke = data.get("joke", "No joke found, but I'm still smiling!")
-            return joke
-    except Exception:
-        return "Sorry, my joke generator is on vacation!"
+    if topic and topic.lower() in CUSTOM_JOKES:
+        return random.choice(CUSTOM_JOKES[topic.lower()])
+    # Take a prefetched JokeAPI joke, or a custom one if the buffer is empty
+    joke = JOKE_RESERVOIR.pop()
+    if joke is None:
+        joke = random.choice(ALL_CUSTOM_JOKES)
+    return joke
 
+@upstream.fetcher
 def get_actor_favorite_movie(actor_name):
     # Try to get from your personality.json first
-    favorites = PERSONALITY.get("actor_favorites", {})
-    if actor_name.lower() in favorites:
-        return favorites[actor_name.lower()]
+    favorite = PERSONALITY.actor_favorite(actor_name)
+    if favorite:
+        return favorite
     # Otherwise, fetch from OMDb (or TMDb) dynamically
     url = "http://www.omdbapi.com/"
     params = {
@@ -131,7 +235,7 @@ def get_actor_favorite_movie(actor_name):
         "s": actor_name,
         "type": "movie"
     }
-    response = requests.get(url, params=params)
+    response = yield upstream.request(url, params=params)
     if response.status_code == 200:
         data = response.json()
         movies = data.get("Search", [])
@@ -140,99 +244,89 @@ def get_actor_favorite_movie(actor_name):
             return f"My favorite {actor_name} movie is {top_movie}!"
     return f"I don't have a favorite {actor_name} movie yet, but I'm always open to suggestions!"
 
-def get_personality_opinion_or_fact(movie_title):
-    title_key = movie_title.lower()
-    facts = PERSONALITY.get("movie_facts", {})
-    opinions = PERSONALITY.get("movie_opinions", {})
-    fallbacks = PERSONALITY.get("movie_fallbacks", [])
-    fact_intros = PERSONALITY.get("fact_intros", [
-        "Here's a tidbit:", "Movie trivia time:", "Did you know?", "Fun fact coming up:",
-        "Here's something cool:", "This is one of my top genres:", "Here's a juicy detail:", "Here's a popcorn-worthy fact:"
-    ])
+# OMDb fields offered as movie facts (the field name doubles as the intro label).
+# Plot is left out, since the movie info answer already shows it.
+OMDB_FACT_FIELDS = ("Awards", "BoxOffice", "Production", "Genre", "Director", "Actors",
+                    "Writer", "Country", "Language", "Released", "Runtime")
 
-    options = []
+# How many facts an OMDb lookup usually yields. The OMDb tier is weighed with
+# this before it is fetched, roughly matching its share once it is.
+OMDB_EXPECTED_FACTS = 8
 
-    # Add all facts (as individual options)
-    if title_key in facts:
-        fact_list = facts[title_key]
-        if isinstance(fact_list, list):
-            options.extend([f"{random.choice(fact_intros)} {fact}" for fact in fact_list])
-        else:
-            options.append(f"{random.choice(fact_intros)} {fact_list}")
+# Function to list the (label, value) facts an OMDb payload has, skipping empty and repeated values
+def omdb_facts(data):
+    facts = []
+    seen = set()
+    for field in OMDB_FACT_FIELDS:
+        value = (data or {}).get(field)
+        if value and value != "N/A" and value not in seen:
+            facts.append((field, value))
+            seen.add(value)
+    return facts
 
-    # Add all opinions (as individual options)
-    if title_key in opinions:
-        opinion_list = opinions[title_key]
-        if isinstance(opinion_list, list):
-            options.extend([f"My take: {op}" for op in opinion_list])
-        else:
-            options.append(f"My take: {opinion_list}")
-
-# Function to get personality opinion or fact about a movie
-def get_personality_opinion_or_fact(movie_title, movie_year=None):
-    title_key = movie_title.lower()
-    facts = PERSONALITY.get("movie_facts", {})
-    opinions = PERSONALITY.get("movie_opinions", {})
-    fallbacks = PERSONALITY.get("movie_fallbacks", [])
-    generic_intros = PERSONALITY.get("fact_intros", [
+# Function to get personality opinion or fact about a movie.
+# The source (tier) is picked first, weighted by how many options it offers:
+# facts and opinions from personality.json, or OMDb fields. OMDb is only
+# fetched when its tier is picked, and not at all if the caller already has
+# the payload (pass it as omdb) or the request's time budget is nearly spent.
+@upstream.fetcher
+def get_personality_opinion_or_fact(movie_title, movie_year=None, omdb=None):
+    generic_intros = PERSONALITY.fact_intros() or (
         "Here's a tidbit:", "Movie trivia time:", "Did you know?", "Fun fact coming up:",
         "Here's something cool:", "Here's a juicy detail:", "Here's a popcorn-worthy fact:"
-    ])
-    omdb_fact_intros = PERSONALITY.get("omdb_fact_intros", {})
+    )
+    facts = PERSONALITY.movie_facts(movie_title)
+    opinions = PERSONALITY.movie_opinions(movie_title)
+    fetched = omdb_facts(omdb) if omdb is not None else None
+    tiers = {"facts": len(facts), "opinions": len(opinions), "omdb": 0}
+    if fetched is not None:
+        tiers["omdb"] = len(fetched)
+    elif not deadline.running_low():
+        tiers["omdb"] = OMDB_EXPECTED_FACTS
 
-    options = []
+    while any(tiers.values()):
+        tier = random.choices(list(tiers), weights=list(tiers.values()))[0]
+        if tier == "facts":
+            return f"{random.choice(generic_intros)} {random.choice(facts)}"
+        if tier == "opinions":
+            return f"My take: {random.choice(opinions)}"
+        if fetched is None:
+            fetched = []
+            try:
+                data = yield from get_omdb_movie_info.steps(movie_title, movie_year, timeout=deadline.clamp(5), retry=False)
+                fetched = omdb_facts(data)
+            except Exception as e:
+                print("OMDb lookup skipped:", e)
+        if fetched:
+            label, value = random.choice(fetched)
+            intro = random.choice(PERSONALITY.omdb_fact_intros(label) or generic_intros)
+            if not intro.endswith(":"):
+                intro += ":"
+            return f"{intro} {value}"
+        # OMDb had nothing for this title, so pick from the other tiers
+        tiers["omdb"] = 0
 
-    # Add all facts (as individual options)
-    if title_key in facts:
-        fact_list = facts[title_key]
-        if isinstance(fact_list, list):
-            options.extend([f"{random.choice(generic_intros)} {fact}" for fact in fact_list])
-        else:
-            options.append(f"{random.choice(generic_intros)} {fact_list}")
+    fallbacks = PERSONALITY.phrases("movie_fallbacks")
+    return random.choice(fallbacks) if fallbacks else ""
 
-    # Add all opinions (as individual options)
-    if title_key in opinions:
-        opinion_list = opinions[title_key]
-        if isinstance(opinion_list, list):
-            options.extend([f"My take: {op}" for op in opinion_list])
-        else:
-            options.append(f"My take: {opinion_list}")
+# Caches for movie lookups (TTLs in seconds). Titles change slowly,
+# the popular list a bit faster. Misses ("Response": "False", no results) are
+# remembered for a shorter time so a typo doesn't cost a call every time.
+OMDB_CACHE = TTLCache("omdb", maxsize=2048, ttl=24 * 3600, negative_ttl=3600)
+TMDB_SEARCH_CACHE = TTLCache("tmdb_search", maxsize=2048, ttl=24 * 3600, negative_ttl=3600)
+TMDB_POPULAR_CACHE = TTLCache("tmdb_popular", maxsize=4, ttl=3600)
 
-    # Add OMDb fields as fun facts, but SKIP Plot (since it's in the main response)
-    data = get_omdb_movie_info(movie_title, movie_year)
-    seen_omdb_values = set()
-    if data:
-        omdb_fields = [
-            ("Awards", "Awards"),
-            ("BoxOffice", "BoxOffice"),
-            ("Production", "Production"),
-            ("Genre", "Genre"),
-            ("Director", "Director"),
-            ("Actors", "Actors"),
-            ("Writer", "Writer"),
-            ("Country", "Country"),
-            ("Language", "Language"),
-            ("Released", "Released"),
-            ("Runtime", "Runtime"),
-        ]
-        for field, label in omdb_fields:
-            value = data.get(field)
-            if value and value != "N/A" and value not in seen_omdb_values:
-                intros = omdb_fact_intros.get(label, generic_intros)
-                intro = random.choice(intros)
-                if not intro.endswith(":"):
-                    intro += ":"
-                formatted = f"{intro} {value}"
-                options.append(formatted)
-                seen_omdb_values.add(value)
-
-    if not options and fallbacks:
-        options.append(random.choice(fallbacks))
-
-    return random.choice(options) if options else ""
+# Function to build a cache key for a movie title so "Inception " and "inception" share an entry
+def movie_cache_key(title, year=None):
+    return (" ".join(title.lower().split()), str(year or ""))
 
 # Function to get movie info from OMDb API
-def get_omdb_movie_info(title, year=None):
+@upstream.fetcher
+def get_omdb_movie_info(title, year=None, timeout=5, retry=True):
+    key = movie_cache_key(title, year)
+    found, cached = OMDB_CACHE.get(key)
+    if found:
+        return cached
     url = "http://www.omdbapi.com/"
     params = {
         "apikey": OMDB_API_KEY,
@@ -240,12 +334,14 @@ def get_omdb_movie_info(title, year=None):
     }
     if year:
         params["y"] = year
-    response = requests.get(url, params=params)
+    response = yield upstream.request(url, params=params, timeout=timeout, retry=retry)
     if response.status_code == 200:
         data = response.json()
         if data.get("Response") == "True":
+            OMDB_CACHE.set(key, data)
             return data
         else:
+            OMDB_CACHE.set(key, None, negative=True)
             return None
     else:
         return None
@@ -275,148 +371,253 @@ TMDB_GENRES = {
     "western": 37
 }
 
-# Function to get movies by genre and year from TMDb
-def get_movies_by_genre(genre=None, year=None):
+# Function to fetch one discover page from TMDb: [(title, tmdb_id)] for a genre id
+# and year (0 = any), or None if TMDb didn't answer
+@upstream.fetcher
+def fetch_discover_slice(genre_id=0, year=0):
     url = "https://api.themoviedb.org/3/discover/movie"
     params = {
         "api_key": TMDB_API_KEY,
         "sort_by": "popularity.desc",
         "page": 1
     }
-    if genre and genre in TMDB_GENRES:
-        params["with_genres"] = TMDB_GENRES[genre]
+    if genre_id:
+        params["with_genres"] = genre_id
     if year:
         params["primary_release_year"] = year
-    response = requests.get(url, params=params)
-    if response.status_code == 200:
-        data = response.json()
-        movies = data.get("results", [])
-        # Return (title, TMDb URL) tuples
-        result = [
-            (movie.get("title"), f"https://www.themoviedb.org/movie/{movie.get('id')}")
-            for movie in movies[:15]
-        ]
-        return result if result else []
+    response = yield upstream.request(url, params=params)
+    if response.status_code != 200:
+        print("TMDb Error:", response.status_code)
+        return None
+    return [(movie.get("title"), movie.get("id")) for movie in response.json().get("results", [])]
+
+# Snapshot of the discover pages for every genre and year (see movie_catalog.py),
+# kept up to date by a background job that starts with the first movie question
+MOVIE_CATALOG = MovieCatalog()
+MOVIE_CATALOG_REFRESHER = CatalogRefresher(MOVIE_CATALOG, catalog_slices(TMDB_GENRES.values()), fetch_discover_slice)
+
+# Slices a random movie is picked from: every genre (or any) for every year
+RANDOM_MOVIE_SLICES = [(genre_id, year) for genre_id, year in MOVIE_CATALOG_REFRESHER.slices if year]
+
+# Function to get movies by genre and year: (title, TMDb URL) tuples.
+# Answers from the local snapshot; a slice it doesn't have yet is fetched and added.
+@upstream.fetcher
+def get_movies_by_genre(genre=None, year=None):
+    MOVIE_CATALOG_REFRESHER.start()
+    genre_id = TMDB_GENRES.get(genre, 0) if genre else 0
+    movies = MOVIE_CATALOG.get(genre_id, year)
+    if movies is None:
+        movies = yield from fetch_discover_slice.steps(genre_id, int(year or 0))
+        if movies is None:
+            return []
+        MOVIE_CATALOG.put(genre_id, year, movies)
+    return [(title, f"https://www.themoviedb.org/movie/{tmdb_id}") for title, tmdb_id in movies[:15]]
+
+# Function to search Google Books by author or subject (used by the book intent)
+@upstream.fetcher
+def search_google_books(search_type, search_value):
+    google_books = []
+    if search_type == "author":
+        g_query = f"inauthor:{search_value}"
     else:
-        print("TMDb Error:", response.status_code, response.text)
-        return []
+        g_query = f"subject:{search_value}"
+    g_params = {"q": g_query, "maxResults": BOOKS_WANTED}
+    g_response = yield upstream.request("https://www.googleapis.com/books/v1/volumes", params=g_params)
+    if g_response.status_code == 200:
+        g_data = g_response.json()
+        for book in g_data.get("items", []):
+            info = book.get("volumeInfo", {})
+            google_books.append({
+                "title": info.get("title", "Unknown Title"),
+                "authors": info.get("authors", []),
+                "year": info.get("publishedDate", "")[:4],
+                "link": info.get("infoLink"),
+                "isbns": [i.get("identifier") for i in info.get("industryIdentifiers", []) if i.get("type", "").startswith("ISBN")],
+                "sources": ["Google Books"],
+            })
+    return google_books
 
-# Function to get book recs from Open Library API
-def get_openlibrary_books(subject="fiction"):
-    url = f"https://openlibrary.org/search.json"
-    params = {"subject": subject, "limit": 10}
-    response = requests.get(url, params=params)
-    if response.status_code == 200:
-        data = response.json()
-        books = []
-        for doc in data.get("docs", []):
-            title = doc.get("title")
-            author = ", ".join(doc.get("author_name", [])) if doc.get("author_name") else "Unknown author"
-            year = doc.get("first_publish_year", "N/A")
-            books.append(f"<b>{title}</b> by {author} ({year})")
-        return books if books else ["No books found for that topic."]
+# Function to search Open Library by author or subject (used by the book intent)
+@upstream.fetcher
+def search_openlibrary_books(search_type, search_value):
+    openlibrary_books = []
+    ol_params = {"limit": BOOKS_WANTED, "fields": "key,title,author_name,first_publish_year,isbn"}
+    if search_type == "author":
+        ol_params["author"] = search_value
     else:
-        return ["Sorry, I couldn't fetch books right now."]
+        ol_params["subject"] = search_value
+    ol_response = yield upstream.request("https://openlibrary.org/search.json", params=ol_params)
+    if ol_response.status_code == 200:
+        ol_data = ol_response.json()
+        for doc in ol_data.get("docs", []):
+            work_key = doc.get("key", "")
+            openlibrary_books.append({
+                "title": doc.get("title"),
+                "authors": doc.get("author_name", []),
+                "year": str(doc.get("first_publish_year", "")),
+                "link": f"https://openlibrary.org{work_key}" if work_key else None,
+                "isbns": doc.get("isbn", []),
+                "sources": ["Open Library"],
+            })
+    return openlibrary_books
 
-# Function to get book recommendations from Google Books API
-def get_book_recommendation(subject="fiction"):
-    url = f"https://www.googleapis.com/books/v1/volumes"
-    params = {"q": f"subject:{subject}", "maxResults": 10}
-    response = requests.get(url, params=params)
-    if response.status_code == 200:
-        data = response.json()
-        items = data.get("items", [])
-        if items:
-            books = []
-            for book in items:
-                info = book.get("volumeInfo", {})
-                title = info.get("title", "Unknown Title")
-                authors = ", ".join(info.get("authors", [])) if info.get("authors") else "Unknown Author"
-                link = info.get("infoLink", "#")
-                books.append(f'<a href="{link}" target="_blank"><strong>{title}</strong></a> by {authors}')
-            intro = random.choice(PERSONALITY.get("book_intros", ["Here are some books you might like:"]))
-            joke_intro = random.choice(PERSONALITY.get("joke_intros", ["Here's a joke:"]))
-            joke = get_random_joke()
-            return f"{intro}<br>" + "<br>".join(books) + f"<br><br><i>{joke_intro} {joke}</i>"
-        else:
-            joke_intro = random.choice(PERSONALITY.get("joke_intros", ["Here's a joke:"]))
-            return f"No books found for {subject}.<br><br><i>{joke}</i>"
+# Function to search every book provider at once and merge their answers (see book_search.py)
+def search_books(search_type, search_value):
+    return collect_books(book_providers(search_type, search_value))
 
-# Function to get events from Ticketmaster API
-def get_ticketmaster_events(city):
+# Same as search_books, awaiting the providers on the event loop
+async def asearch_books(search_type, search_value):
+    return await acollect_books(book_providers(search_type, search_value))
+
+search_books.aio = asearch_books
+
+# Function to list the book provider searches for a query
+def book_providers(search_type, search_value):
+    return {
+        "google_books": partial(search_google_books, search_type, search_value),
+        "openlibrary_books": partial(search_openlibrary_books, search_type, search_value),
+    }
+
+# Function to format a merged book as a link, with the providers that listed it
+def book_link(book):
+    authors = ", ".join(book.get("authors") or []) or "Unknown author"
+    line = f'<a href="{book.get("link") or "#"}" target="_blank"><strong>{book.get("title")}</strong></a> by {authors}'
+    if book.get("year"):
+        line += f" ({book['year']})"
+    return line + f' <span style="color:#888">({", ".join(book.get("sources", []))})</span>'
+
+# Function to fetch a city's events from Ticketmaster: [{"name", "date", "url"}],
+# or None if Ticketmaster didn't answer
+@upstream.fetcher
+def fetch_city_events(city):
     url = f"https://app.ticketmaster.com/discovery/v2/events.json"
     params = {
         "apikey": TICKETMASTER_CONSUMER_KEY,
         "city": city,
         "size": 12  # Number of events to return
     }
-    response = requests.get(url, params=params)
-    if response.status_code == 200:
-        data = response.json()
-        events = data.get("_embedded", {}).get("events", [])
-        result = []
-        for event in events:
-            name = event.get("name")
-            date = event.get("dates", {}).get("start", {}).get("localDate")
-            url = event.get("url")  # Ticketmaster event page
-            if name and url:
-                result.append((f"{name} on {date}", url))
-        return result if result else []
+    response = yield upstream.request(url, params=params)
+    if response.status_code != 200:
+        return None
+    events = response.json().get("_embedded", {}).get("events", [])
+    result = []
+    for event in events:
+        name = event.get("name")
+        date = event.get("dates", {}).get("start", {}).get("localDate")
+        url = event.get("url")  # Ticketmaster event page
+        if name and url:
+            result.append({"name": name, "date": date, "url": url})
+    return result
+
+# Upcoming events by city (see event_store.py). The pre-warmer keeps the most
+# asked-for cities fresh, topped up with ACTIVABOT_EVENT_CITIES (comma-separated).
+EVENT_STORE = EventStore("ticketmaster_events")
+EVENT_PREWARMER = EventPrewarmer(
+    EVENT_STORE, fetch_city_events,
+    seed_cities=[city.strip() for city in os.getenv("ACTIVABOT_EVENT_CITIES", "").split(",") if city.strip()],
+)
+
+# Function to get a city's upcoming events: ("name on date", url) tuples,
+# served from EVENT_STORE when we have the city
+@upstream.fetcher
+def get_ticketmaster_events(city):
+    EVENT_PREWARMER.start()
+    events = EVENT_STORE.get(city)
+    if events is not None:
+        metrics.UPSTREAM_CALLS_SAVED.inc(provider="ticketmaster", intent=metrics.CURRENT_INTENT.get(),
+                                         source="event_store")
     else:
-        return []
+        events = yield from fetch_city_events.steps(city)
+        if events is None:
+            return []
+        events = EVENT_STORE.put(city, events)
+    return [(f"{event['name']} on {event['date']}", event["url"]) for event in events]
 
-# Function to get city coordinates from Geoapify API
+# Geocoded cities, kept on disk across restarts
+GEOCODE_STORE = GeocodeStore()
+
+# Function to get city coordinates from Geoapify API (served from the geocode store when we've seen the city before)
+@upstream.fetcher
 def get_city_coordinates(city):
+    found, coords = GEOCODE_STORE.get(city)
+    if found:
+        return coords
     url = "https://api.geoapify.com/v1/geocode/search"
     params = {
         "text": city,
         "apiKey": GEOAPIFY_API_KEY
     }
-    response = requests.get(url, params=params)
+    response = yield upstream.request(url, params=params)
     if response.status_code == 200:
         data = response.json()
         features = data.get("features", [])
         if features:
             coords = features[0]["geometry"]["coordinates"]
+            GEOCODE_STORE.put(city, coords[0], coords[1])
             return coords[0], coords[1]  # lon, lat
+        # Remember that Geoapify doesn't know this place
+        GEOCODE_STORE.put(city, None, None)
     return None, None
 
-# Function to get places from Geoapify API
+# Places found around a point, by category and grid cell (see place_cache.py)
+PLACE_CACHE = PlaceCache("geoapify_places")
+PLACE_LIMIT = 15
+
+# Function to get places from Geoapify API ("name - address" strings, nearest first).
+# Searches inside a circle we already fetched are answered from PLACE_CACHE.
+@upstream.fetcher
 def get_geoapify_places(city, category="tourism.sights", radius=80000):
-    lon, lat = get_city_coordinates(city)
+    lon, lat = yield from get_city_coordinates.steps(city)
     if lon is None or lat is None:
         return []
+    lat, lon = snap_to_cell(lat, lon)
+    source, places = PLACE_CACHE.get(category, lat, lon, radius, PLACE_LIMIT)
+    if source is not None:
+        metrics.UPSTREAM_CALLS_SAVED.inc(provider="geoapify", intent=metrics.CURRENT_INTENT.get(),
+                                         source=f"place_{source}")
+        return [f"{place['name']} - {place['address']}" for place in places]
     url = "https://api.geoapify.com/v2/places"
     params = {
         "categories": category,
         "filter": f"circle:{lon},{lat},{radius}",  # radius in meters
-        "limit": 15,
+        "bias": f"proximity:{lon},{lat}",  # nearest first, so the cache knows how far the answer reaches
+        "limit": PLACE_LIMIT,
         "apiKey": GEOAPIFY_API_KEY
     }
-    response = requests.get(url, params=params)
+    response = yield upstream.request(url, params=params)
     if response.status_code == 200:
-        data = response.json()
-        places = data.get("features", [])
-        print("Geoapify places:", places)
-        result = []
-        for place in places:
-            name = place.get("properties", {}).get("name")
-            address = place.get("properties", {}).get("formatted")
-            if name and address:
-                result.append(f"{name} - {address}")
-        return result
+        features = response.json().get("features", [])
+        places = []
+        for feature in features:
+            properties = feature.get("properties", {})
+            name = properties.get("name")
+            address = properties.get("formatted")
+            coordinates = feature.get("geometry", {}).get("coordinates")
+            if name and address and coordinates:
+                places.append({"name": name, "address": address, "lon": coordinates[0], "lat": coordinates[1]})
+        PLACE_CACHE.set(category, lat, lon, radius, PLACE_LIMIT, places, complete=len(features) < PLACE_LIMIT)
+        return [f"{place['name']} - {place['address']}" for place in places]
     else:
         return []
-    
+
+# Function to get places, expanding the search radius if nothing is found nearby
+@upstream.fetcher
+def get_geoapify_places_expanding(city, category="tourism.sights"):
+    places = yield from get_geoapify_places.steps(city, category=category, radius=80000)
+    if not places:
+        places = yield from get_geoapify_places.steps(city, category=category, radius=150000)
+    return places
+
 
 # Function to get breweries from Open Brewery DB
+@upstream.fetcher
 def get_breweries(city):
     url = "https://api.openbrewerydb.org/v1/breweries"
     params = {
-        "by_city": city,
+        "by_city": city.split(",")[0].strip(),  # Open Brewery DB matches the city name alone
         "per_page": 15
     }
-    response = requests.get(url, params=params)
+    response = yield upstream.request(url, params=params)
     if response.status_code == 200:
         breweries = response.json()
         result = []
@@ -425,47 +626,62 @@ def get_breweries(city):
             address = brewery.get("address_1")
             if name and address:
                 result.append(f"{name} - {address}")
-        return result if result else ["No breweries found in that city."]
+        return result
     else:
-        return ["Error fetching breweries."]
+        return []
     
-# Function to get recipes from TheMealDB
+# Function to fetch every TheMealDB meal starting with a letter:
+# [{"id", "name", "ingredients"}], or None if TheMealDB didn't answer
+@upstream.fetcher
+def fetch_meals_by_letter(letter):
+    response = yield upstream.request("https://www.themealdb.com/api/json/v1/1/search.php", params={"f": letter})
+    if response.status_code != 200:
+        print("MealDB import error:", response.status_code)
+        return None
+    meals = response.json().get("meals") or []
+    return [
+        {
+            "id": meal.get("idMeal"),
+            "name": meal.get("strMeal"),
+            "ingredients": [meal[f"strIngredient{i}"] for i in range(1, 21) if (meal.get(f"strIngredient{i}") or "").strip()],
+        }
+        for meal in meals
+    ]
+
+# TheMealDB catalog, imported once and searched locally (see meal_index.py)
+MEAL_INDEX = MealIndex()
+
+# Function to get recipes: (meal name, MealDB URL) tuples, at most 15.
+# Answers from the local index once the catalog is imported, and from
+# TheMealDB's ingredient filter until then.
+@upstream.fetcher
 def get_meal_recipes(ingredient):
+    MEAL_INDEX.start_import(fetch_meals_by_letter)
+    if MEAL_INDEX.ready():
+        return [(name, f"https://www.themealdb.com/meal/{meal_id}") for meal_id, name in MEAL_INDEX.search(ingredient)]
     url = "https://www.themealdb.com/api/json/v1/1/filter.php"
     params = {"i": ingredient}
-    response = requests.get(url, params=params)
-    print("MealDB API:", response.url, response.status_code, response.text)
+    response = yield upstream.request(url, params=params)
     if response.status_code == 200: # Successful response
-        data = response.json() # Parse JSON response
-        meals = data.get("meals") # Get list of meals
-        if meals: # If meals found
-            return [
-                (meal.get("strMeal"), f"https://www.themealdb.com/meal/{meal.get('idMeal')}") # Return (meal name, MealDB URL) tuples
-                for meal in meals[:15] # Limit to 15 results
-            ]
-        else:
-            # Fallback: try searching by meal name
-            url2 = "https://www.themealdb.com/api/json/v1/1/search.php"
-            params2 = {"s": ingredient}
-            response2 = requests.get(url2, params=params2)
-            print("MealDB Fallback API:", response2.url, response2.status_code, response2.text)
-            if response2.status_code == 200:
-                data2 = response2.json()
-                meals2 = data2.get("meals")
-                if meals2:
-                    return [
-                        (meal.get("strMeal"), f"https://www.themealdb.com/meal/{meal.get('idMeal')}")
-                        for meal in meals2[:15]
-                    ]
+        meals = response.json().get("meals") or [] # Get list of meals
+        return [
+            (meal.get("strMeal"), f"https://www.themealdb.com/meal/{meal.get('idMeal')}") # Return (meal name, MealDB URL) tuples
+            for meal in meals[:15] # Limit to 15 results
+        ]
+    print("MealDB API error:", response.status_code)
     return []
-    
+
 # Function to get popular movies from TMDb
+@upstream.fetcher
 def get_popular_movies():
+    found, cached = TMDB_POPULAR_CACHE.get("popular")
+    if found:
+        return cached
     url = "https://api.themoviedb.org/3/movie/popular"
     params = {
         "api_key": TMDB_API_KEY
     }
-    response = requests.get(url, params=params)
+    response = yield upstream.request(url, params=params)
     if response.status_code == 200:
         data = response.json()
         movies = data.get("results", [])
@@ -474,13 +690,20 @@ def get_popular_movies():
             (movie.get("title"), f"https://www.themoviedb.org/movie/{movie.get('id')}")
             for movie in movies[:15]
         ]
-        return result if result else []
+        if result:
+            TMDB_POPULAR_CACHE.set("popular", result)
+        return result
     else:
         print("TMDb Error:", response.status_code, response.text)
         return []
 
 # Function to search for a movie on TMDb    
+@upstream.fetcher
 def search_tmdb_movie(title, year=None):
+    key = movie_cache_key(title, year)
+    found, cached = TMDB_SEARCH_CACHE.get(key)
+    if found:
+        return cached
     url = "https://api.themoviedb.org/3/search/movie"
     params = {
         "api_key": TMDB_API_KEY,
@@ -488,529 +711,761 @@ def search_tmdb_movie(title, year=None):
     }
     if year:
         params["year"] = year
-    response = requests.get(url, params=params)
+    response = yield upstream.request(url, params=params, timeout=5)
     if response.status_code == 200:
         data = response.json()
         results = data.get("results", [])
         # Try to find an exact title match (case-insensitive)
         exact_matches = [movie for movie in results if movie.get("title", "").lower() == title.lower()]
-        if exact_matches:
-            # Pick the most recent by release_date
-            movie = max(exact_matches, key=lambda m: m.get("release_date", ""))
-            return {
-                "title": movie.get("title"),
-                "year": movie.get("release_date", "")[:4],
-                "id": movie.get("id"),
-                "url": f"https://www.themoviedb.org/movie/{movie.get('id')}"
-            }
-        # Fallback: pick the most recent result
-        if results:
-            movie = max(results, key=lambda m: m.get("release_date", ""))
-            return {
-                "title": movie.get("title"),
-                "year": movie.get("release_date", "")[:4],
-                "id": movie.get("id"),
-                "url": f"https://www.themoviedb.org/movie/{movie.get('id')}"
-            }
+        # Pick the most recent exact match by release_date, or fall back to the most recent result
+        candidates = exact_matches or results
+        if not candidates:
+            TMDB_SEARCH_CACHE.set(key, None, negative=True)
+            return None
+        movie = max(candidates, key=lambda m: m.get("release_date", ""))
+        info = {
+            "title": movie.get("title"),
+            "year": movie.get("release_date", "")[:4],
+            "id": movie.get("id"),
+            "url": f"https://www.themoviedb.org/movie/{movie.get('id')}"
+        }
+        TMDB_SEARCH_CACHE.set(key, info)
+        return info
     return None
 
+# Function to turn a popular movie (title, url) into a linked block with a fun fact/opinion
+@upstream.fetcher
+def enrich_popular_movie(movie):
+    title, url = movie
+    tmdb_info = yield from search_tmdb_movie.steps(title)
+    if tmdb_info:
+        omdb_title = tmdb_info["title"]
+        omdb_year = tmdb_info["year"]
+        omdb_fact = yield from get_personality_opinion_or_fact.steps(omdb_title, omdb_year)
+        block = f'<a href="{tmdb_info["url"]}" target="_blank"><strong>{omdb_title}</strong></a>'
+    else:
+        # fallback to original
+        omdb_fact = yield from get_personality_opinion_or_fact.steps(title)
+        block = f'<a href="{url}" target="_blank"><strong>{title}</strong></a>'
+    if omdb_fact:
+        block += f"<br><i>{omdb_fact}</i>"
+    return block
+
+# Function to build the popular-movie blocks for "movies in <city>".
+# Movies whose lookups are too slow just get a plain link (partial results).
+def get_popular_movie_blocks():
+    movies = get_popular_movies()
+    enriched = map_bounded(enrich_popular_movie, movies)
+    return linked_movie_blocks(movies, enriched)
+
+# Same as get_popular_movie_blocks, awaiting the enrichment on the event loop
+async def aget_popular_movie_blocks():
+    movies = await get_popular_movies.aio()
+    enriched = await map_bounded_async(enrich_popular_movie.aio, movies)
+    return linked_movie_blocks(movies, enriched)
+
+get_popular_movie_blocks.aio = aget_popular_movie_blocks
+
+# Function to pair enrichment results with their movies, using a plain link where enrichment failed
+def linked_movie_blocks(movies, enriched):
+    return [
+        block or f'<a href="{url}" target="_blank"><strong>{title}</strong></a>'
+        for block, (title, url) in zip(enriched, movies)
+    ]
+
+# Function to turn a genre movie (title, url) into a linked block with a fun fact/opinion
+@upstream.fetcher
+def enrich_genre_movie(movie):
+    title, url = movie
+    fact = yield from get_personality_opinion_or_fact.steps(title)
+    block = f'<a href="{url}" target="_blank"><strong>{title}</strong></a>'
+    if fact:
+        block += f"<br><i>{fact}</i>"
+    return block
+
+# Function to build the movie blocks for a genre/year request, with a fun fact/opinion for each.
+# The lookups run in parallel; movies whose lookups are too slow just get a plain link.
+def get_genre_movie_blocks(genre=None, year=None):
+    movies = get_movies_by_genre(genre, year)
+    enriched = map_bounded(enrich_genre_movie, movies)
+    return linked_movie_blocks(movies, enriched)
+
+# Same as get_genre_movie_blocks, awaiting the enrichment on the event loop
+async def aget_genre_movie_blocks(genre=None, year=None):
+    movies = await get_movies_by_genre.aio(genre, year)
+    enriched = await map_bounded_async(enrich_genre_movie.aio, movies)
+    return linked_movie_blocks(movies, enriched)
+
+get_genre_movie_blocks.aio = aget_genre_movie_blocks
+
+# Function to pick a random movie from TMDb: {"year", "title", "link"}, title None if nothing was found.
+# The genre and year are picked first, so every year is as likely however much
+# of the snapshot is built; a slice the snapshot doesn't have yet is fetched and added.
+@upstream.fetcher
+def get_random_movie():
+    MOVIE_CATALOG_REFRESHER.start()
+    genre_id, year = random.choice(RANDOM_MOVIE_SLICES)
+    movies = MOVIE_CATALOG.get(genre_id, year)
+    if movies is None:
+        movies = yield from fetch_discover_slice.steps(genre_id, year)
+        if movies is None:
+            return None
+        MOVIE_CATALOG.put(genre_id, year, movies)
+    if not movies:
+        return {"year": year, "title": None, "link": None}
+    title, tmdb_id = random.choice(movies)
+    return {"year": year, "title": title, "link": f"https://www.themoviedb.org/movie/{tmdb_id}"}
+
 # Creating Flask App
 app = Flask(__name__)
 
-# Simple Bot Logic Function (def): take user input and return a response
-def get_bot_response(user_input):
-    user_input_lower = user_input.lower()
+# Start watching personality.json for edits once the app serves its first
+# request (not at import, so loading the app starts no threads)
+@app.before_request
+def watch_personality():
+    PERSONALITY_FILE.start()
 
-    # If the user is asking for a book, movie, or info, allow all topics
-    is_media_query = any(
-        kw in user_input_lower
-        for kw in ["book", "novel", "read", "movie", "film", "show", "series", "documentary"]
-    )
-    is_info_query = any(
-        kw in user_input_lower
-        for kw in ["who is", "what is", "tell me about", "info about", "information about"]
-    )
+# Regexes used by the intent handlers, compiled once at load time
+INFO_RE = re.compile(r"(?:get info (?:about|for|on)|tell me about|movie info|info (?:about|for|on)|what is|who is)\s+(.+?)(?:[.?!]|$)")
+DIRECTOR_RE = re.compile(r"(?:who directed|director(?: of| for| in)?|who is the director of)\s+(.+?)(?:[.?!]|$)")
+STARS_RE = re.compile(r"(?:who starred in|star(?: of| in)?|stars in|who are the stars of)\s+(.+?)(?:[.?!]|$)")
+DANGEROUS_RE = re.compile("|".join([
+    r"how to (make|build|create|cook|synthesize|prepare) (a )?(bomb|poison|explosive|weapon|drug|meth|overdose)",
+    r"recipe for (poison|explosive|bomb|meth|drugs|overdose)",
+    r"best way to (kill|murder|harm|hurt)",
+    r"where to buy (bomb|poison|drugs|weapon|explosive)",
+    r"how can i (kill|murder|harm|hurt|overdose)"
+]))
+LOCATION_RE = re.compile(r"\b(?:near|in)\s+([a-zA-Z0-9 ,]+)")
+RECIPE_RE = re.compile(r"recipes (?:for|with|using)\s+([a-zA-Z0-9 \-]+)")
+YEAR_RE = re.compile(r"\b(19\d{2}|20\d{2})\b")
+DECADE_RE = re.compile(r"\b(19\d0|20\d0)s\b")
+BOOK_AUTHOR_RE = re.compile(r"(?:author|by)\s+([a-zA-Z0-9 ,.'-]+)")
+BOOK_GENRE_RE = re.compile(r"(?:genre|type|kind of|category)\s+([a-zA-Z0-9 ,.'-]+)")
+BOOK_SUBJECT_RE = re.compile(r"(?:about|on|for|regarding|concerning|related to|subject)\s+([a-zA-Z0-9 ,.'-]+)")
+BOOK_FALLBACK_RE = re.compile(r"(?:book|novel|read)\s*(?:about|on|for)?\s*([a-zA-Z0-9 ,.'-]+)?")
 
-    # Only block if it's a dangerous intent, not a media/info search
-    if not (is_media_query or is_info_query):
-        dangerous_patterns = [
-            r"how to (make|build|create|cook|synthesize|prepare) (a )?(bomb|poison|explosive|weapon|drug|meth|overdose)",
-            r"recipe for (poison|explosive|bomb|meth|drugs|overdose)",
-            r"best way to (kill|murder|harm|hurt)",
-            r"where to buy (bomb|poison|drugs|weapon|explosive)",
-            r"how can i (kill|murder|harm|hurt|overdose)"
-        ]
-        for pattern in dangerous_patterns:
-            if re.search(pattern, user_input_lower):
-                return (
-                    "Whoa there! 🚨 I'm all about fun and good vibes, not felonies or foul play. "
-                    "How about a recipe for chocolate cake instead? 🍰"
-                )
-
-    # Goodbyes
-    if any(word in user_input_lower for word in PERSONALITY.get("goodbye_keywords", [])):
-        return random.choice(PERSONALITY.get("goodbyes", ["Goodbye!"]))
-
-    # Thanks
-    if any(re.search(rf"\b{re.escape(word)}\b", user_input_lower) for word in PERSONALITY.get("thanks_keywords", [])):
-        return random.choice(PERSONALITY.get("thanks", ["You're welcome!"]))
-
-    # Greetings (match whole words only)
-    bot_name = PERSONALITY.get("bot_name", "Activabot")
-    for word in PERSONALITY["greeting_keywords"]:
-        if re.search(rf"\b{re.escape(word)}\b", user_input_lower):
-            greeting = random.choice(PERSONALITY["greetings"]).replace("{bot_name}", bot_name)
-            return greeting
-        
-    # Help command
-    if "help" in user_input_lower or "directions" in user_input_lower:
-        return (
-            f"<strong>Welcome to {bot_name}!</strong><br><em>Your fun-seeking, pun-loving activity sidekick!</em><br><br>"
-            "I can help you find <b>events</b>, <b>restaurants</b>, <b>breweries</b>, <b>sights</b>, <b>theaters</b>, <b>movies</b>, <b>recipes</b>, and <b>books</b>.<br><br>"
-            "<b>How to use me:</b><ul>"
-            "<li>events in Dallas</li>"
-            "<li>restaurants near 73019</li>"
-            "<li>breweries in Austin</li>"
-            "<li>sights in Paris, France</li>"
-            "<li>theaters in Miami, OK</li>"
-            "<li>movies in Houston</li>"
-            "<li>action movies from 1995</li>"
-            "<li>random movie</li>"
-            "<li>recipes for chicken</li>"
-            "<li>book about science</li>"
-            "</ul>"
-            "You can use <b>in</b> or <b>near</b> for city, state, country, or zipcode. If nothing is found, I'll automatically expand the search area!"
-        )
-
-    # OMDb movie info intent
-    match = re.search(
-    r"(?:get info (?:about|for|on)|tell me about|movie info|info (?:about|for|on)|what is|who is)\s+(.+?)(?:[.?!]|$)", user_input_lower
+# Function to build the intent router from the personality keywords and the branch triggers.
+# Rules are listed in priority order (the order the old if/elif chain checked them).
+def build_intent_router(personality):
+    router = IntentRouter(fallback="fallback")
+    # Media and info searches are allowed to mention anything, so they switch off the safety filter
+    router.add_flag("media", ["book", "novel", "read", "movie", "film", "show", "series", "documentary"])
+    router.add_flag("info", ["who is", "what is", "tell me about", "info about", "information about"])
+    router.add("dangerous", keywords=["how to", "recipe for", "best way to", "where to buy", "how can i"],
+               unless=["media", "info"], confirm=DANGEROUS_RE)
+    router.add("goodbye", keywords=personality.phrases("goodbye_keywords"))
+    router.add("thanks", whole_words=personality.phrases("thanks_keywords"))
+    router.add("greeting", whole_words=personality.phrases("greeting_keywords"))
+    router.add("help", keywords=["help", "directions"])
+    router.add("movie_info", keywords=["info", "tell me about", "what is", "who is"], confirm=INFO_RE)
+    router.add("director", keywords=["who directed", "director"], confirm=DIRECTOR_RE)
+    router.add("stars", keywords=["star"], confirm=STARS_RE)
+    router.add("restaurants", keywords=[
+        "where can i eat", "places to eat", "good food", "restaurants near",
+        "restaurants in", "restaurant in", "food in",
+    ])
+    router.add("events", keywords=["events in"])
+    router.add("sights", keywords=["sights", "tourist"])
+    router.add("breweries", keywords=["breweries in"])
+    router.add("recipes", keywords=["recipes for", "recipes with", "recipes using"])
+    router.add("movies_in", keywords=["movies in", "movies near"])
+    router.add("movies", keywords=["movie"])
+    router.add("theaters", keywords=["theaters", "cinemas"])
+    router.add("books", keywords=["book", "read", "novel"])
+    router.add("hello", keywords=["hello"])
+    return router.compile()
+
+INTENT_ROUTER = build_intent_router(PERSONALITY)
+
+# Function to switch to a reloaded personality: the router is rebuilt first,
+# since the greeting/thanks/goodbye keywords come from the personality file
+def use_personality(personality):
+    global PERSONALITY, INTENT_ROUTER
+    INTENT_ROUTER = build_intent_router(personality)
+    PERSONALITY = personality
+
+PERSONALITY_FILE.on_reload(use_personality)
+
+# Fallback values for fan-out tasks that fail or miss the deadline
+FANOUT_DEFAULTS = {
+    "joke": "Sorry, my joke generator is on vacation!",
+    "fact": "",
+    "places": [],
+    "events": [],
+    "breweries": [],
+    "recipes": [],
+    "movie_blocks": [],
+    "random_movie": None,
+    "theaters": [],
+    "books": [],
+}
+
+# Intent handlers: each takes the lowercased message and the router's match (or None)
+
+def handle_dangerous(user_input_lower, match):
+    return (
+        "Whoa there! 🚨 I'm all about fun and good vibes, not felonies or foul play. "
+        "How about a recipe for chocolate cake instead? 🍰"
     )
-    if match:
-        movie_title = match.group(1).strip(" .?!,")
-        print(f"OMDb intent triggered. Movie title: '{movie_title}'")  # <-- Add this line
-        data = get_omdb_movie_info(movie_title)
-        print(f"OMDb API response: {data}")  # <-- And this line
-        if data:
-            movie_intro = random.choice(PERSONALITY.get("movie_response_intros", [
-                "Oh, I love movies! Here’s what I found:"
-            ]))
-            # Search TMDb for link
-            tmdb_info = search_tmdb_movie(data.get('Title', movie_title), data.get('Year'))
-            if tmdb_info:
-                title_block = f'<a href="{tmdb_info["url"]}" target="_blank"><b>{data.get("Title", "Unknown")}</b></a> ({data.get("Year", "N/A")})'
-            else:
-                title_block = f'<b>{data.get("Title", "Unknown")}</b> ({data.get("Year", "N/A")})'
-            response = f"{movie_intro}<br>{title_block}<br>"
-            response += f"IMDB Rating: {data.get('imdbRating', 'N/A')}<br>"
-            response += f"Plot: {data.get('Plot', 'No plot available.')}<br>"
-            extra = get_personality_opinion_or_fact(data.get('Title', 'Unknown'))
-            if extra:
-                response += f"<br><i>{extra}</i>"
-            return response
-        else:
-            return f"Sorry, I couldn't find info about {movie_title}."
-        
-    # Director intent
-    match = re.search(r"(?:who directed|director(?: of| for| in)?|who is the director of)\s+(.+?)(?:[.?!]|$)", user_input_lower)
-    if match:
-        movie_title = match.group(1).strip(" .?!,")
-        data = get_omdb_movie_info(movie_title)
-        if data and data.get("Director"):
-            response = f"The director of <b>{data.get('Title', 'Unknown')}</b> is {data['Director']}."
-            return response
-        else:
-            return f"Sorry, I couldn't find the director for {movie_title}."
-
-    # Stars intent
-    match = re.search(r"(?:who starred in|star(?: of| in)?|stars in|who are the stars of)\s+(.+?)(?:[.?!]|$)", user_input_lower)
-    if match:
-        movie_title = match.group(1).strip(" .?!,")
-        data = get_omdb_movie_info(movie_title)
-        if data and data.get("Actors"):
-            response = f"The stars of <b>{data.get('Title', 'Unknown')}</b> are {data['Actors']}."
-            return response
-        else:
-            return f"Sorry, I couldn't find the stars for {movie_title}."
 
-    # OMDb general info intent
-    match = re.search(
-        r"(?:get info (?:about|for|on)|tell me about|movie info|info (?:about|for|on)|what is|who is)\s+(.+?)(?:[.?!]|$)", user_input_lower
+def handle_goodbye(user_input_lower, match):
+    return PERSONALITY.pick("goodbyes", "Goodbye!")
+
+def handle_thanks(user_input_lower, match):
+    return PERSONALITY.pick("thanks", "You're welcome!")
+
+def handle_greeting(user_input_lower, match):
+    return PERSONALITY.pick("greetings", f"Hi, I'm {PERSONALITY.bot_name}!")
+
+def handle_help(user_input_lower, match):
+    bot_name = PERSONALITY.bot_name
+    return (
+        f"<strong>Welcome to {bot_name}!</strong><br><em>Your fun-seeking, pun-loving activity sidekick!</em><br><br>"
+        "I can help you find <b>events</b>, <b>restaurants</b>, <b>breweries</b>, <b>sights</b>, <b>theaters</b>, <b>movies</b>, <b>recipes</b>, and <b>books</b>.<br><br>"
+        "<b>How to use me:</b><ul>"
+        "<li>events in Dallas</li>"
+        "<li>restaurants near 73019</li>"
+        "<li>breweries in Austin</li>"
+        "<li>sights in Paris, France</li>"
+        "<li>theaters in Miami, OK</li>"
+        "<li>movies in Houston</li>"
+        "<li>action movies from 1995</li>"
+        "<li>random movie</li>"
+        "<li>recipes for chicken</li>"
+        "<li>book about science</li>"
+        "</ul>"
+        "You can use <b>in</b> or <b>near</b> for city, state, country, or zipcode. If nothing is found, I'll automatically expand the search area!"
     )
-    if match:
-        movie_title = match.group(1).strip(" .?!,")
-        data = get_omdb_movie_info(movie_title)
-        if data:
-            response = f"<b>{data.get('Title', 'Unknown')}</b> ({data.get('Year', 'N/A')})<br>"
-            response += f"IMDB Rating: {data.get('imdbRating', 'N/A')}<br>"
-            response += f"Plot: {data.get('Plot', 'No plot available.')}<br>"
-            if data.get('Awards'):
-                response += f"Fun Fact: {data['Awards']}<br>"
-            return response
-        else:
-            return f"Sorry, I couldn't find info about {movie_title}."
-
-    # Flexible restaurant queries (city, state, country, or zipcode)
-    elif (
-    "where can i eat" in user_input_lower
-    or "places to eat" in user_input_lower
-    or "good food" in user_input_lower
-    or "restaurants near" in user_input_lower
-    or "places to eat near" in user_input_lower
-    or "restaurants in" in user_input_lower
-    or "restaurant in" in user_input_lower  # Add this line
-    or "food in" in user_input_lower
-):
-        match = re.search(r"(?:near|in)\s+([a-zA-Z0-9 ,]+)", user_input_lower)
-        if match:
-            location = match.group(1).strip()
-            # Try default radius first
-            places = get_geoapify_places(location, category="catering.restaurant", radius=80000)
-            # If no results, try a larger radius
-            if not places:
-                places = get_geoapify_places(location, category="catering.restaurant", radius=150000)
-            if not places:
-                return f"No restaurants found near {location}."
-            restaurant_links = [
-                f'<a href="https://www.google.com/maps/search/{name.split(" - ")[0].replace(" ", "+")}+{location.replace(" ", "+")}" target="_blank">{name}</a>'
-                for name in places
-            ]
-            intro = random.choice(PERSONALITY.get("restaurant_intros", ["Here are some places to eat:"]))
-            joke_intro = random.choice(PERSONALITY.get("joke_intros", ["Here's a joke:"]))
-            joke = get_random_joke(topic="restaurant")
-            fact = get_wiki_fact(location)
-            if not fact:
-                fact = get_wiki_fact("restaurant")
-            return f"<strong>Activabot:</strong><br>{intro}<br>" + "<br>".join(restaurant_links) + f"<br><br><i>{joke_intro} {joke}</i><br><br>{fact}"        
+
+# OMDb movie info intent
+def handle_movie_info(user_input_lower, match):
+    movie_title = match.group(1).strip(" .?!,")
+    print(f"OMDb intent triggered. Movie title: '{movie_title}'")  # <-- Add this line
+    data = get_omdb_movie_info(movie_title)
+    print(f"OMDb API response: {data}")  # <-- And this line
+    if data:
+        movie_intro = PERSONALITY.pick("movie_response_intros", "Oh, I love movies! Here’s what I found:")
+        # Search TMDb for link
+        tmdb_info = search_tmdb_movie(data.get('Title', movie_title), data.get('Year'))
+        if tmdb_info:
+            title_block = f'<a href="{tmdb_info["url"]}" target="_blank"><b>{data.get("Title", "Unknown")}</b></a> ({data.get("Year", "N/A")})'
         else:
-            return "Please specify a city, state, country, or zipcode, e.g., 'restaurants in Dallas' or 'places to eat near 75001'."
+            title_block = f'<b>{data.get("Title", "Unknown")}</b> ({data.get("Year", "N/A")})'
+        response = f"{movie_intro}<br>{title_block}<br>"
+        response += f"IMDB Rating: {data.get('imdbRating', 'N/A')}<br>"
+        response += f"Plot: {data.get('Plot', 'No plot available.')}<br>"
+        extra = get_personality_opinion_or_fact(data.get('Title', movie_title), data.get('Year'), omdb=data)
+        if extra:
+            response += f"<br><i>{extra}</i>"
+        return response
+    else:
+        return f"Sorry, I couldn't find info about {movie_title}."
+
+# Director intent
+def handle_director(user_input_lower, match):
+    movie_title = match.group(1).strip(" .?!,")
+    data = get_omdb_movie_info(movie_title)
+    if data and data.get("Director"):
+        response = f"The director of <b>{data.get('Title', 'Unknown')}</b> is {data['Director']}."
+        return response
+    else:
+        return f"Sorry, I couldn't find the director for {movie_title}."
+
+# Stars intent
+def handle_stars(user_input_lower, match):
+    movie_title = match.group(1).strip(" .?!,")
+    data = get_omdb_movie_info(movie_title)
+    if data and data.get("Actors"):
+        response = f"The stars of <b>{data.get('Title', 'Unknown')}</b> are {data['Actors']}."
+        return response
+    else:
+        return f"Sorry, I couldn't find the stars for {movie_title}."
+
+# Listing intents are written as plans: a plan parses the message and returns
+# either a finished answer (a string, e.g. "please specify a city") or
+# (tasks, render). tasks maps names to zero-argument callables, usually
+# partials of fetchers. The sync path runs them on the thread pool, the async
+# path awaits their .aio versions.
+#
+# render turns the listing results into (html, segments). segments names the
+# trailing tasks (the joke and the fact) to add after the listing, or is empty
+# when there is nothing to show them under. render never reads those trailing
+# results itself, so the streaming route can send the listing before they
+# arrive.
+
+# Trailing segments, in the order they appear under a listing
+TRAILING_SEGMENTS = ("joke", "fact")
+
+# Function to build the standard listing block: intro, then one link per line
+def render_listing(intro, links):
+    return f"<strong>Activabot:</strong><br>{intro}<br>" + "<br>".join(links), TRAILING_SEGMENTS
+
+# Function to render one trailing segment (joke or fact) as it is appended to the listing
+def render_segment(name, value):
+    if name == "joke":
+        joke_intro = PERSONALITY.pick("joke_intros", "Here's a joke:")
+        return f"<br><br><i>{joke_intro} {value}</i>"
+    return f"<br><br>{value}"
+
+# Function to link a "Name - Address" place to a Google Maps search near the location
+def maps_link(name, location, full_name=False):
+    query = name if full_name else name.split(" - ")[0]
+    return f'<a href="https://www.google.com/maps/search/{query.replace(" ", "+")}+{location.replace(" ", "+")}" target="_blank">{name}</a>'
+
+# Flexible restaurant queries (city, state, country, or zipcode)
+def plan_restaurants(user_input_lower, match):
+    match = LOCATION_RE.search(user_input_lower)
+    if not match:
+        return "Please specify a city, state, country, or zipcode, e.g., 'restaurants in Dallas' or 'places to eat near 75001'."
+    location = match.group(1).strip()
+
+    def render(results):
+        places = results["places"]
+        if not places:
+            return f"No restaurants found near {location}.", ()
+        intro = PERSONALITY.pick("restaurant_intros", "Here are some places to eat:")
+        return render_listing(intro, [maps_link(name, location) for name in places])
+
+    # Fetch places (expanding the radius if needed), a joke and a fact at the same time
+    return {
+        "places": partial(get_geoapify_places_expanding, location, category="catering.restaurant"),
+        "joke": partial(get_random_joke, topic="restaurant"),
+        "fact": partial(get_wiki_fact_or, location, "restaurant"),
+    }, render
 
-    # Events
-    elif "events in" in user_input_lower:
-        city = user_input_lower.split("in")[-1].strip()
-        events = get_ticketmaster_events(city)
+# Events
+def plan_events(user_input_lower, match):
+    match = LOCATION_RE.search(user_input_lower)
+    city = match.group(1).strip() if match else ""
+
+    def render(results):
+        events = results["events"]
         if not events:
-            return f"No events found in {city}."
-        event_links = [
-            f'<a href="{url}" target="_blank">{name}</a>'
-            for name, url in events
-        ]
-        intro = random.choice(PERSONALITY.get("event_intros", ["Here are some upcoming events:"]))
-        joke_intro = random.choice(PERSONALITY.get("joke_intros", ["Here's a joke:"]))
-        fact = get_wiki_fact(city)
-        if not fact:
-            fact = get_wiki_fact("event")
-        joke = get_random_joke(topic="event")
-        return f"<strong>Activabot:</strong><br>{intro}<br>" + "<br>".join(event_links) + f"<br><br><i>{joke_intro} {joke}</i><br><br>{fact}"
-        
-
-    # Restaurants (direct command)
-    elif "food in" in user_input_lower or "restaurants in" in user_input_lower:
-        city = user_input_lower.split("in")[-1].strip()
-        places = get_geoapify_places(city, category="catering.restaurant")
+            return f"No events found in {city}.", ()
+        event_links = [f'<a href="{url}" target="_blank">{name}</a>' for name, url in events]
+        intro = PERSONALITY.pick("event_intros", "Here are some upcoming events:")
+        return render_listing(intro, event_links)
+
+    return {
+        "events": partial(get_ticketmaster_events, city),
+        "joke": partial(get_random_joke, topic="event"),
+        "fact": partial(get_wiki_fact_or, city, "event"),
+    }, render
+
+# Sights
+def plan_sights(user_input_lower, match):
+    match = LOCATION_RE.search(user_input_lower)
+    if not match:
+        return "Please specify a city, state, country, or zipcode, e.g., 'sights in Paris' or 'tourist near 75001'."
+    location = match.group(1).strip()
+
+    def render(results):
+        places = results["places"]
         if not places:
-            return f"No restaurants found in {city}."
-        restaurant_links = [
-            f'<a href="https://www.google.com/maps/search/{name.replace(" ", "+")}+{city.replace(" ", "+")}" target="_blank">{name}</a>'
-            for name in places
-        ]
-        intro = random.choice(PERSONALITY.get("restaurant_intros", ["Here are some places to eat:"]))
-        return f"{intro}<br>" + "<br>".join(restaurant_links)
-
-    # Sights
-    elif (
-            "sights" in user_input_lower
-            or "tourist" in user_input_lower
-        ):
-            match = re.search(r"(?:near|in)\s+([a-zA-Z0-9 ,]+)", user_input_lower)
-            if match:
-                location = match.group(1).strip()
-                # Try default radius first
-                places = get_geoapify_places(location, category="tourism.sights", radius=80000)
-                # If no results, try a larger radius
-                if not places:
-                    places = get_geoapify_places(location, category="tourism.sights", radius=150000)
-                if not places:
-                    return f"No sights found near {location}."
-                sight_links = [
-                    f'<a href="https://www.google.com/maps/search/{name.split(" - ")[0].replace(" ", "+")}+{location.replace(" ", "+")}" target="_blank">{name}</a>'
-                    for name in places
-                ]
-                intro = random.choice(PERSONALITY.get("sight_intros", ["Here are some sights to see:"]))
-                joke_intro = random.choice(PERSONALITY.get("joke_intros", ["Here's a joke:"]))
-                joke = get_random_joke(topic="sightseeing")
-                fact = get_wiki_fact(location)
-                if not fact:
-                    fact = get_wiki_fact("tourism")
-                return f"<strong>Activabot:</strong><br>{intro}<br>" + "<br>".join(sight_links) + f"<br><br><i>{joke_intro} {joke}</i><br><br>{fact}"
-            else:
-                return "Please specify a city, state, country, or zipcode, e.g., 'sights in Paris' or 'tourist near 75001'."
-
-    # Breweries
-    elif "breweries in" in user_input_lower:
-        city = user_input_lower.split("in")[-1].strip()
-        breweries = get_breweries(city)
+            return f"No sights found near {location}.", ()
+        intro = PERSONALITY.pick("sight_intros", "Here are some sights to see:")
+        return render_listing(intro, [maps_link(name, location) for name in places])
+
+    # Fetch sights (expanding the radius if needed), a joke and a fact at the same time
+    return {
+        "places": partial(get_geoapify_places_expanding, location, category="tourism.sights"),
+        "joke": partial(get_random_joke, topic="sightseeing"),
+        "fact": partial(get_wiki_fact_or, location, "tourism"),
+    }, render
+
+# Breweries
+def plan_breweries(user_input_lower, match):
+    match = LOCATION_RE.search(user_input_lower)
+    if not match:
+        return "Please specify a city, e.g., 'breweries in Austin'."
+    city = match.group(1).strip()
+
+    def render(results):
+        breweries = results["breweries"]
         if not breweries:
-            return f"No breweries found in {city}."
-        brewery_links = [
-            f'<a href="https://www.google.com/maps/search/{name.replace(" ", "+")}+{city.replace(" ", "+")}" target="_blank">{name}</a>'
-            for name in breweries
-        ]
-        intro = random.choice(PERSONALITY.get("brewery_intros", ["Here are some breweries:"]))
-        joke_intro = random.choice(PERSONALITY.get("joke_intros", ["Here's a joke:"]))
-        joke = get_random_joke(topic="brewery")
-        fact = get_wiki_fact(city)
-        if not fact:
-            fact = get_wiki_fact("brewery")
-        return f"<strong>Activabot:</strong><br>{intro}<br>" + "<br>".join(brewery_links) + f"<br><br><i>{joke_intro} {joke}</i><br><br>{fact}"
-    # Recipes
-    elif "recipes for" in user_input_lower or "recipes with" in user_input_lower or "recipes using" in user_input_lower:
-        match = re.search(r"recipes (?:for|with|using)\s+([a-zA-Z0-9 \-]+)", user_input_lower)
-        if match:
-            ingredient = match.group(1).strip()
-            recipes = get_meal_recipes(ingredient)
-            if not recipes:
-                return f"No recipes found with {ingredient}."
-            recipe_links = [f'<a href="{url}" target="_blank">{name}</a>' for name, url in recipes]
-            intro = random.choice(PERSONALITY.get("recipe_intros", ["Here are some recipes:"]))
-            joke_intro = random.choice(PERSONALITY.get("joke_intros", ["Here's a joke:"]))
-            joke = get_random_joke(topic="recipe")
-            fact = get_wiki_fact(ingredient)
-            if not fact:
-                fact = get_wiki_fact("recipe")
-            return f"<strong>Activabot:</strong><br>{intro}<br>" + "<br>".join(recipe_links) + f"<br><br><i>{joke_intro} {joke}</i><br><br>{fact}"
-        else:
-            return "Please specify an ingredient, e.g., 'recipes with chicken'."
+            return f"No breweries found in {city}.", ()
+        intro = PERSONALITY.pick("brewery_intros", "Here are some breweries:")
+        return render_listing(intro, [maps_link(name, city, full_name=True) for name in breweries])
 
-    # Movies + Theaters (combined)
-    elif "movies in" in user_input_lower or "movies near" in user_input_lower:
-        if "movies in" in user_input_lower:
-            city = user_input_lower.split("in")[-1].strip()
-        else:
-            city = user_input_lower.split("near")[-1].strip()
-        movies = get_popular_movies()
-        theaters = get_geoapify_places(city, category="entertainment.cinema")
-        # Make movie titles clickable and add a fun fact/opinion for each
-        movie_blocks = []
-        for title, url in movies:
-            tmdb_info = search_tmdb_movie(title)
-            if tmdb_info:
-                omdb_title = tmdb_info["title"]
-                omdb_year = tmdb_info["year"]
-                omdb_fact = get_personality_opinion_or_fact(omdb_title, omdb_year)
-                block = f'<a href="{tmdb_info["url"]}" target="_blank"><strong>{omdb_title}</strong></a>'
-                if omdb_fact:
-                    block += f"<br><i>{omdb_fact}</i>"
-                movie_blocks.append(block)
-            else:
-                # fallback to original
-                omdb_fact = get_personality_opinion_or_fact(title)
-                block = f'<a href="{url}" target="_blank"><strong>{title}</strong></a>'
-                if omdb_fact:
-                    block += f"<br><i>{omdb_fact}</i>"
-                movie_blocks.append(block)
-        intro = random.choice(PERSONALITY.get("movie_response_intros", ["Here are some popular movies right now:"]))
-        movies_response = f"{intro}<br>" + "<br><br>".join(movie_blocks)
+    return {
+        "breweries": partial(get_breweries, city),
+        "joke": partial(get_random_joke, topic="brewery"),
+        "fact": partial(get_wiki_fact_or, city, "brewery"),
+    }, render
+
+# Recipes
+def plan_recipes(user_input_lower, match):
+    match = RECIPE_RE.search(user_input_lower)
+    if not match:
+        return "Please specify an ingredient, e.g., 'recipes with chicken'."
+    ingredient = match.group(1).strip()
+
+    def render(results):
+        recipes = results["recipes"]
+        if not recipes:
+            return f"No recipes found with {ingredient}.", ()
+        recipe_links = [f'<a href="{url}" target="_blank">{name}</a>' for name, url in recipes]
+        intro = PERSONALITY.pick("recipe_intros", "Here are some recipes:")
+        return render_listing(intro, recipe_links)
+
+    return {
+        "recipes": partial(get_meal_recipes, ingredient),
+        "joke": partial(get_random_joke, topic="recipe"),
+        "fact": partial(get_wiki_fact_or, ingredient, "recipe"),
+    }, render
+
+# Movies + Theaters (combined)
+def plan_movies_in(user_input_lower, match):
+    match = LOCATION_RE.search(user_input_lower)
+    if not match:
+        return "Please specify a city or zipcode, e.g., 'movies in Dallas' or 'movies near 75001'."
+    city = match.group(1).strip()
+
+    def render(results):
+        intro = PERSONALITY.pick("movie_response_intros", "Here are some popular movies right now:")
+        movies_response = f"{intro}<br>" + "<br><br>".join(results["movie_blocks"])
         # Make theater names clickable (Google Maps search)
-        theater_links = [
-            f'<a href="https://www.google.com/maps/search/{name.split(" - ")[0].replace(" ", "+")}+{city.replace(" ", "+")}" target="_blank">{name}</a>'
-            for name in theaters
-        ]
+        theater_links = [maps_link(name, city) for name in results["theaters"]]
         theaters_response = f"<br><br>Here are some theaters in {city}:<br>" + "<br>".join(theater_links)
-        joke_intro = random.choice(PERSONALITY.get("joke_intros", ["Here's a joke:"]))
-        joke = get_random_joke(topic="movie")
-        fact = get_wiki_fact(city)
-        if not fact:
-            fact = get_wiki_fact("movie")
-        return f"<strong>Activabot:</strong><br>" + movies_response + theaters_response + f"<br><br><i>{joke_intro} {joke}</i><br><br>{fact}"
-        
-
-    # Movies by genre, year, decade, or random
-    elif "movie" in user_input_lower:
-        import random as pyrandom
-
-        # Extract genre
-        genre = None
-        for g in TMDB_GENRES:
-            if g in user_input_lower:
-                genre = g
-                break
-
-        # Extract year
-        year = None
-        match_year = re.search(r"\b(19\d{2}|20\d{2})\b", user_input_lower)
-        if match_year:
-            year = match_year.group(1)
-
-        # Extract decade (e.g., "1980s", "1970s")
-        match_decade = re.search(r"\b(19\d0|20\d0)s\b", user_input_lower)
-        if match_decade:
-            decade_start = int(match_decade.group(1))
-            year = str(pyrandom.randint(decade_start, decade_start + 9))
-
-        # Random movie request
-        if "random" in user_input_lower:
-            # Pick a random year between 1950 and last year
-            rand_year = pyrandom.randint(1950, 2025)
-            # Pick a random page (TMDb allows up to 500)
-            rand_page = pyrandom.randint(1, 10)
-            url = "https://api.themoviedb.org/3/discover/movie"
-            params = {
-                "api_key": TMDB_API_KEY,
-                "sort_by": "popularity.desc",
-                "page": rand_page,
-                "primary_release_year": rand_year
-            }
-            response = requests.get(url, params=params)
-            if response.status_code == 200:
-                data = response.json()
-                movies = data.get("results", [])
-                if movies:
-                    movie = pyrandom.choice(movies)
-                    title = movie.get("title", "Unknown Title")
-                    link = f"https://www.themoviedb.org/movie/{movie.get('id')}"
-                    return f'Here is a random movie from {rand_year}:<br><a href="{link}" target="_blank">{title}</a>'
-                else:
-                    return "Couldn't find a random movie right now."
-            else:
-                return "Error fetching a random movie."
+        return f"<strong>Activabot:</strong><br>" + movies_response + theaters_response, TRAILING_SEGMENTS
+
+    # The movie list is enriched while the cinema lookup, joke and fact run alongside it
+    return {
+        "movie_blocks": get_popular_movie_blocks,
+        "theaters": partial(get_geoapify_places, city, category="entertainment.cinema"),
+        "joke": partial(get_random_joke, topic="movie"),
+        "fact": partial(get_wiki_fact_or, city, "movie"),
+    }, render
+
+# Movies by genre, year, decade, or random
+def plan_movies(user_input_lower, match):
+    # Random movie request
+    if "random" in user_input_lower:
+        def render_random(results):
+            movie = results["random_movie"]
+            if movie is None:
+                return "Error fetching a random movie.", ()
+            if not movie["title"]:
+                return "Couldn't find a random movie right now.", ()
+            return f'Here is a random movie from {movie["year"]}:<br><a href="{movie["link"]}" target="_blank">{movie["title"]}</a>', ()
+        return {"random_movie": get_random_movie}, render_random
+
+    # Extract genre
+    genre = None
+    for g in TMDB_GENRES:
+        if g in user_input_lower:
+            genre = g
+            break
+
+    # Extract year
+    year = None
+    match_year = YEAR_RE.search(user_input_lower)
+    if match_year:
+        year = match_year.group(1)
+
+    # Extract decade (e.g., "1980s", "1970s")
+    match_decade = DECADE_RE.search(user_input_lower)
+    if match_decade:
+        decade_start = int(match_decade.group(1))
+        year = str(random.randint(decade_start, decade_start + 9))
+
+    def render(results):
+        movie_blocks = results["movie_blocks"]
+        if not movie_blocks:
+            return "No movies found for your request.", ()
+        # Use a personality-packed intro
+        if genre and year:
+            header = f"{PERSONALITY.pick('movie_response_intros', 'Movie time!')} Here are some {genre.title()} movies from {year}:<br>"
+        elif genre:
+            header = f"{PERSONALITY.pick('movie_response_intros', 'Movie time!')} Here are some {genre.title()} movies:<br>"
+        elif year:
+            header = f"{PERSONALITY.pick('movie_response_intros', 'Movie time!')} Here are some movies from {year}:<br>"
         else:
-            movies = get_movies_by_genre(genre, year)
-            if not movies:
-                return "No movies found for your request."
-            # For each movie, get a fun fact/opinion
-            movie_blocks = []
-            for title, url in movies:
-                fact = get_personality_opinion_or_fact(title)
-                joke_intro = random.choice(PERSONALITY.get("joke_intros", ["Here's a joke:"]))
-                joke = get_random_joke(topic="movie")
-                block = f'<a href="{url}" target="_blank"><strong>{title}</strong></a>'
-                if fact:
-                    block += f"<br><i>{fact}</i>"
-                movie_blocks.append(block)
-            # Use a personality-packed intro
-            if genre and year:
-                header = f"{random.choice(PERSONALITY.get('movie_response_intros', ['Movie time!']))} Here are some {genre.title()} movies from {year}:<br>"
-            elif genre:
-                header = f"{random.choice(PERSONALITY.get('movie_response_intros', ['Movie time!']))} Here are some {genre.title()} movies:<br>"
-            elif year:
-                header = f"{random.choice(PERSONALITY.get('movie_response_intros', ['Movie time!']))} Here are some movies from {year}:<br>"
-            else:
-                header = f"{random.choice(PERSONALITY.get('movie_response_intros', ['Movie time!']))} Here are some popular movies right now:<br>"
-            joke_intro = random.choice(PERSONALITY.get("joke_intros", ["Here's a joke:"]))
-            joke = get_random_joke(topic="movie")
-            fact = get_wiki_fact(year if year else "movie")
-            if not fact:
-                fact = get_wiki_fact("movie")
-            return header + "<br><br>".join(movie_blocks) + f"<br><br><i>{joke_intro} {joke}</i><br><br>{fact}"
-            
-            
-
-    # Theaters only
-    elif (
-            "theaters" in user_input_lower
-            or "cinemas" in user_input_lower
-        ):
-            match = re.search(r"(?:near|in)\s+([a-zA-Z0-9 ,]+)", user_input_lower)
-            if match:
-                location = match.group(1).strip()
-                # Try default radius first
-                theaters = get_geoapify_places(location, category="entertainment.cinema", radius=80000)
-                # If no results, try a larger radius
-                if not theaters:
-                    theaters = get_geoapify_places(location, category="entertainment.cinema", radius=150000)
-                if not theaters:
-                    return f"No theaters found near {location}."
-                theater_links = [
-                    f'<a href="https://www.google.com/maps/search/{name.split(" - ")[0].replace(" ", "+")}+{location.replace(" ", "+")}" target="_blank">{name}</a>'
-                    for name in theaters
-                ]
-                return f"Here are some movie theaters near {location}:<br>" + "<br>".join(theater_links)
-            else:
-                return "Please specify a city, state, country, or zipcode, e.g., 'theaters in Dallas' or 'cinemas near 75001'."
-    
-    # Book recommendations
-    elif "book" in user_input_lower or "read" in user_input_lower or "novel" in user_input_lower:
+            header = f"{PERSONALITY.pick('movie_response_intros', 'Movie time!')} Here are some popular movies right now:<br>"
+        return header + "<br><br>".join(movie_blocks), TRAILING_SEGMENTS
+
+    return {
+        "movie_blocks": partial(get_genre_movie_blocks, genre, year),
+        "joke": partial(get_random_joke, topic="movie"),
+        "fact": partial(get_wiki_fact_or, year if year else "movie", "movie"),
+    }, render
+
+# Theaters only
+def plan_theaters(user_input_lower, match):
+    match = LOCATION_RE.search(user_input_lower)
+    if not match:
+        return "Please specify a city, state, country, or zipcode, e.g., 'theaters in Dallas' or 'cinemas near 75001'."
+    location = match.group(1).strip()
+
+    def render(results):
+        theaters = results["theaters"]
+        if not theaters:
+            return f"No theaters found near {location}.", ()
+        theater_links = [maps_link(name, location) for name in theaters]
+        return f"Here are some movie theaters near {location}:<br>" + "<br>".join(theater_links), ()
+
+    return {"theaters": partial(get_geoapify_places_expanding, location, category="entertainment.cinema")}, render
+
+# Book recommendations
+def plan_books(user_input_lower, match):
     # Try to extract search type and value
-        author_match = re.search(r"(?:author|by)\s+([a-zA-Z0-9 ,.'-]+)", user_input_lower)
-        genre_match = re.search(r"(?:genre|type|kind of|category)\s+([a-zA-Z0-9 ,.'-]+)", user_input_lower)
-        subject_match = re.search(r"(?:about|on|for|regarding|concerning|related to|subject)\s+([a-zA-Z0-9 ,.'-]+)", user_input_lower)
-        
-        # Default to subject if nothing else
+    author_match = BOOK_AUTHOR_RE.search(user_input_lower)
+    genre_match = BOOK_GENRE_RE.search(user_input_lower)
+    subject_match = BOOK_SUBJECT_RE.search(user_input_lower)
+
+    # Default to subject if nothing else
+    search_type = "subject"
+    search_value = "fiction"
+    if author_match:
+        search_type = "author"
+        search_value = author_match.group(1).strip()
+    elif genre_match:
         search_type = "subject"
-        search_value = "fiction"
-        if author_match:
-            search_type = "author"
-            search_value = author_match.group(1).strip()
-        elif genre_match:
-            search_type = "subject"
-            search_value = genre_match.group(1).strip()
-        elif subject_match:
-            search_type = "subject"
-            search_value = subject_match.group(1).strip()
-        else:
-            # fallback: try to extract a word after "book" or "novel"
-            fallback_match = re.search(r"(?:book|novel|read)\s*(?:about|on|for)?\s*([a-zA-Z0-9 ,.'-]+)?", user_input_lower)
-            if fallback_match and fallback_match.group(1):
-                search_value = fallback_match.group(1).strip()
-
-        # Google Books API
-        google_books = []
-        if search_type == "author":
-            g_query = f"inauthor:{search_value}"
-        else:
-            g_query = f"subject:{search_value}"
-        g_params = {"q": g_query, "maxResults": 5}
-        g_response = requests.get("https://www.googleapis.com/books/v1/volumes", params=g_params)
-        if g_response.status_code == 200:
-            g_data = g_response.json()
-            for book in g_data.get("items", []):
-                info = book.get("volumeInfo", {})
-                title = info.get("title", "Unknown Title")
-                authors = ", ".join(info.get("authors", [])) if info.get("authors") else "Unknown Author"
-                link = info.get("infoLink", "#")
-                google_books.append(f'<a href="{link}" target="_blank"><strong>{title}</strong></a> by {authors} <span style="color:#888">(Google Books)</span>')
-
-        # Open Library API
-        openlibrary_books = []
-        ol_params = {"limit": 5}
-        if search_type == "author":
-            ol_params["author"] = search_value
-        else:
-            ol_params["subject"] = search_value
-        ol_response = requests.get("https://openlibrary.org/search.json", params=ol_params)
-        if ol_response.status_code == 200:
-            ol_data = ol_response.json()
-            for doc in ol_data.get("docs", []):
-                title = doc.get("title")
-                author = ", ".join(doc.get("author_name", [])) if doc.get("author_name") else "Unknown author"
-                year = doc.get("first_publish_year", "N/A")
-                work_key = doc.get("key", "")
-                link = f"https://openlibrary.org{work_key}" if work_key else "#"
-                openlibrary_books.append(f'<a href="{link}" target="_blank"><strong>{title}</strong></a> by {author} ({year}) <span style="color:#888">(Open Library)</span>')
-
-        all_books = google_books + openlibrary_books
-        if all_books:
-            intro = random.choice(PERSONALITY.get("book_intros", ["Here are some books you might like:"]))
-            joke_intro = random.choice(PERSONALITY.get("joke_intros", ["Here's a joke:"]))
-            joke = get_random_joke(topic="book")
-            fact = get_wiki_fact(search_value)
-            if not fact:
-                fact = get_wiki_fact("book")
-            return f"<strong>Activabot:</strong><br>{intro}<br>" + "<br>".join(all_books) + f"<br><br><i>{joke_intro} {joke}</i><br><br>{fact}"
-        else:
-            return f"No books found for {search_value}."
+        search_value = genre_match.group(1).strip()
+    elif subject_match:
+        search_type = "subject"
+        search_value = subject_match.group(1).strip()
+    else:
+        # fallback: try to extract a word after "book" or "novel"
+        fallback_match = BOOK_FALLBACK_RE.search(user_input_lower)
+        if fallback_match and fallback_match.group(1):
+            search_value = fallback_match.group(1).strip()
 
-    # Greetings
-    elif "hello" in user_input_lower:
-        return "Hello! How can I help you today?"
+    def render(results):
+        if not results["books"]:
+            return f"No books found for {search_value}.", ()
+        intro = PERSONALITY.pick("book_intros", "Here are some books you might like:")
+        return render_listing(intro, [book_link(book) for book in results["books"]])
 
-    # Fallback
-    else:
-        fallback = random.choice(PERSONALITY["fallbacks"]).replace("{bot_name}", bot_name)
-        joke_intro = random.choice(PERSONALITY.get("joke_intros", ["Here's a joke:"]))
-        joke = get_random_joke()
-        return f"{fallback}<br><br><i>{joke_intro} {joke}</i>"
+    # Query the book providers, a joke and a fact at the same time
+    return {
+        "books": partial(search_books, search_type, search_value),
+        "joke": partial(get_random_joke, topic="book"),
+        "fact": partial(get_wiki_fact_or, search_value, "book"),
+    }, render
+
+# Greetings
+def handle_hello(user_input_lower, match):
+    return "Hello! How can I help you today?"
+
+# Fallback
+def handle_fallback(user_input_lower, match):
+    fallback = PERSONALITY.pick("fallbacks", f"I'm {PERSONALITY.bot_name}, and I didn't catch that.")
+    joke_intro = PERSONALITY.pick("joke_intros", "Here's a joke:")
+    joke = get_random_joke()
+    return f"{fallback}<br><br><i>{joke_intro} {joke}</i>"
+
+# Intent name (from INTENT_ROUTER) -> plan, for the intents that fan out to upstream APIs
+INTENT_PLANS = {
+    "restaurants": plan_restaurants,
+    "events": plan_events,
+    "sights": plan_sights,
+    "breweries": plan_breweries,
+    "recipes": plan_recipes,
+    "movies_in": plan_movies_in,
+    "movies": plan_movies,
+    "theaters": plan_theaters,
+    "books": plan_books,
+}
+
+# Function to render a plan's results as one HTML answer
+def render_plan(render, results):
+    html, segments = render(results)
+    report_unrendered(results, segments)
+    return html + "".join(render_segment(name, results[name]) for name in segments)
+
+# Function to report trailing segments (joke, fact) that were fetched but left
+# out of the answer, e.g. when a listing came back empty (see request_scope.py)
+def report_unrendered(results, segments):
+    scope = request_scope.current()
+    if scope is None:
+        return
+    for name in TRAILING_SEGMENTS:
+        if name not in segments and results.get(name) not in (None, FANOUT_DEFAULTS.get(name)):
+            scope.discard("unrendered", name)
+
+# Cache of listing results (the data under an answer, not its HTML), keyed by
+# the fetch function and its normalized arguments, e.g.
+# ("get_breweries", ("austin",), ()). Intros, jokes and facts are still picked
+# fresh every time, so a cached answer doesn't read the same twice. The movie
+# listings aren't cached here: their blocks carry randomly picked fun facts,
+# and the TMDb/OMDb data under them has its own caches. Neither are events:
+# EVENT_STORE drops the ones that have passed, which a cached copy wouldn't.
+INTENT_RESULT_CACHE = TTLCache("intent_results", maxsize=2048, ttl=1800)
+CACHEABLE_RESULTS = {"places", "breweries", "recipes", "theaters", "books"}
+
+# Function to normalize one task argument for the result cache key
+def normalize_param(value):
+    return normalize_location(value) if isinstance(value, str) else value
+
+# Function to build the result cache key for a task (a partial of a fetcher)
+def result_cache_key(task):
+    func = getattr(task, "func", task)
+    args = tuple(normalize_param(arg) for arg in getattr(task, "args", ()))
+    keywords = tuple(sorted((name, normalize_param(value))
+                            for name, value in (getattr(task, "keywords", None) or {}).items()))
+    return func.__name__, args, keywords
+
+# Function to split a plan's tasks into results we already have and tasks still to run
+def split_cached(tasks):
+    cached = {}
+    to_run = {}
+    for name, task in tasks.items():
+        if name in CACHEABLE_RESULTS:
+            found, value = INTENT_RESULT_CACHE.get(result_cache_key(task))
+            if found:
+                cached[name] = value
+                continue
+        to_run[name] = task
+    return cached, to_run
+
+# Function to cache the listing results that came back. Empty lists are left
+# out, since a failed or timed-out task also comes back empty.
+def remember_results(tasks, results):
+    for name, value in results.items():
+        if name in CACHEABLE_RESULTS and name in tasks and value:
+            INTENT_RESULT_CACHE.set(result_cache_key(tasks[name]), value)
+
+# Function to run a plan's tasks on the thread pool, serving listings from the result cache when we can
+def collect_plan(tasks):
+    cached, to_run = split_cached(tasks)
+    results = run_parallel(to_run, defaults=FANOUT_DEFAULTS, optional=TRAILING_SEGMENTS,
+                           optional_timeout=deadline.optional_wait())
+    remember_results(to_run, results)
+    results.update(cached)
+    return results
+
+# Function to carry out a plan on the thread pool
+def run_plan(plan):
+    if isinstance(plan, str):
+        return plan
+    tasks, render = plan
+    return render_plan(render, collect_plan(tasks))
+
+# Function to carry out a plan on the event loop
+async def arun_plan(plan):
+    if isinstance(plan, str):
+        return plan
+    tasks, render = plan
+    cached, to_run = split_cached(tasks)
+    results = await run_parallel_async(to_run, defaults=FANOUT_DEFAULTS, optional=TRAILING_SEGMENTS,
+                                       optional_timeout=deadline.optional_wait())
+    remember_results(to_run, results)
+    results.update(cached)
+    return render_plan(render, results)
+
+# Function to carry out a plan piece by piece: yields (segment, html), first
+# the listing as soon as its own tasks are done, then the joke and fact in
+# whatever order they finish. All tasks start together and share one deadline;
+# the joke and fact are only waited for until the request budget is spent.
+def stream_plan(plan):
+    if isinstance(plan, str):
+        yield "listing", plan
+        return
+    tasks, render = plan
+    give_up_at = time.monotonic() + FANOUT_TIMEOUT
+    cached, to_run = split_cached(tasks)
+    futures = submit_all(to_run)
+    listing = {name: future for name, future in futures.items() if name not in TRAILING_SEGMENTS}
+    results = gather(listing, defaults=FANOUT_DEFAULTS)
+    remember_results(to_run, results)
+    results.update(cached)
+    html, segments = render(results)
+    yield "listing", html
+    trailing = {}
+    for name in TRAILING_SEGMENTS:
+        if name in segments:
+            trailing[name] = futures[name]
+        elif name in futures and not futures[name].cancel():
+            # Too late to cancel: it has already started (or finished)
+            request_scope.current().discard("unrendered", name)
+    trailing_wait = give_up_at - time.monotonic()
+    if deadline.optional_wait() is not None:
+        trailing_wait = min(trailing_wait, deadline.optional_wait())
+    for name, value in iter_ready(trailing, timeout=max(0, trailing_wait), defaults=FANOUT_DEFAULTS):
+        yield name, render_segment(name, value)
+
+# Function to wrap a plan as a regular intent handler
+def plan_handler(plan_fn):
+    def handler(user_input_lower, match):
+        return run_plan(plan_fn(user_input_lower, match))
+    return handler
+
+# Intent name (from INTENT_ROUTER) -> handler
+INTENT_HANDLERS = {
+    "dangerous": handle_dangerous,
+    "goodbye": handle_goodbye,
+    "thanks": handle_thanks,
+    "greeting": handle_greeting,
+    "help": handle_help,
+    "movie_info": handle_movie_info,
+    "director": handle_director,
+    "stars": handle_stars,
+    "hello": handle_hello,
+    "fallback": handle_fallback,
+}
+for intent, plan_fn in INTENT_PLANS.items():
+    INTENT_HANDLERS[intent] = plan_handler(plan_fn)
+
+# Simple Bot Logic Function (def): take user input and return a response
+def get_bot_response(user_input):
+    user_input_lower = user_input.lower()
+    # One pass over the message picks the intent, then its handler builds the response
+    intent, match = INTENT_ROUTER.route(user_input_lower)
+    with metrics.track_response(intent, "sync"), deadline.budget(), request_scope.scope():
+        return INTENT_HANDLERS[intent](user_input_lower, match)
+
+# Structured version of get_bot_response for the JSON API:
+# {"intent", "items", "joke", "fact", "html"}. items holds the raw listing
+# results by task name; joke and fact are None when the answer has none.
+def get_bot_result(user_input):
+    user_input_lower = user_input.lower()
+    intent, match = INTENT_ROUTER.route(user_input_lower)
+    result = {"intent": intent, "items": {}, "joke": None, "fact": None}
+    with metrics.track_response(intent, "api"), deadline.budget(), request_scope.scope():
+        plan = INTENT_PLANS[intent](user_input_lower, match) if intent in INTENT_PLANS else None
+        if plan is None:
+            result["html"] = INTENT_HANDLERS[intent](user_input_lower, match)
+            return result
+        if isinstance(plan, str):
+            result["html"] = plan
+            return result
+        tasks, render = plan
+        results = collect_plan(tasks)
+        html, segments = render(results)
+        report_unrendered(results, segments)
+        result["items"] = {name: value for name, value in results.items() if name not in TRAILING_SEGMENTS}
+        for name in segments:
+            result[name] = results[name]
+            html += render_segment(name, results[name])
+        result["html"] = html
+        return result
+
+# Async version of get_bot_response: listing intents await their upstream calls
+# on the event loop, the rest run their regular handler on a worker thread
+async def get_bot_response_async(user_input):
+    user_input_lower = user_input.lower()
+    intent, match = INTENT_ROUTER.route(user_input_lower)
+    with metrics.track_response(intent, "async"), deadline.budget(), request_scope.scope():
+        if intent in INTENT_PLANS:
+            return await arun_plan(INTENT_PLANS[intent](user_input_lower, match))
+        return await asyncio.to_thread(INTENT_HANDLERS[intent], user_input_lower, match)
+
+# Streaming version of get_bot_response: yields (segment, html) pieces of the
+# answer as they become ready (see stream_plan)
+def get_bot_response_stream(user_input):
+    user_input_lower = user_input.lower()
+    intent, match = INTENT_ROUTER.route(user_input_lower)
+    with metrics.track_response(intent, "stream"), deadline.budget(), request_scope.scope():
+        if intent in INTENT_PLANS:
+            yield from stream_plan(INTENT_PLANS[intent](user_input_lower, match))
+        else:
+            yield "listing", INTENT_HANDLERS[intent](user_input_lower, match)
+
+# Function to format one Server-Sent Event (every line of data gets its own "data:" prefix)
+def sse_event(event, data):
+    return f"event: {event}\n" + "".join(f"data: {line}\n" for line in data.split("\n")) + "\n"
 
 # Route for Chat Interface
 @app.route("/", methods=["GET", "POST"])
@@ -1021,6 +1476,103 @@ def chat():
         bot_response = get_bot_response(user_input)
     return render_template("chat.html", bot_response=bot_response)
 
+# Async route for the same chat interface: the message is answered on the
+# shared event loop (see upstream.run_on_loop), where its upstream calls are
+# awaited instead of blocking threads and share one httpx client with every
+# other message
+@app.route("/async", methods=["GET", "POST"])
+def chat_async():
+    bot_response = ""
+    if request.method == "POST":
+        user_input = request.form["user_input"]
+        bot_response = upstream.run_on_loop(get_bot_response_async(user_input))
+    return render_template("chat.html", bot_response=bot_response)
+
+# Streaming route (Server-Sent Events): the listing is sent as soon as it is
+# ready and the joke and fact follow as they resolve. chat.html uses it when
+# JavaScript is available; the form POST above stays as the fallback.
+@app.route("/stream")
+def chat_stream():
+    user_input = request.args.get("user_input", "")
+
+    def events():
+        for segment, html in get_bot_response_stream(user_input):
+            yield sse_event(segment, html)
+        yield sse_event("done", "")
+
+    # No-cache / no proxy buffering so each event reaches the browser right away
+    return Response(events(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# Route for cache hit/miss counters (JSON), handy for checking API quota savings
+@app.route("/stats/cache")
+def cache_stats_route():
+    return jsonify(cache_stats())
+
+# Limits for the JSON batch API
+API_BATCH_LIMIT = 100  # messages per request
+API_BATCH_WORKERS = 8  # messages answered at the same time
+API_ITEM_TIMEOUT = FANOUT_TIMEOUT + 3
+API_BATCH_TIMEOUT = 60
+API_USAGE = "Send a JSON body like {\"messages\": [\"restaurants in Dallas\"]}."
+
+# Function to answer one batch message, reporting a failed answer as an error instead of a timeout
+def get_api_result(message):
+    try:
+        return get_bot_result(message)
+    except Exception as e:
+        print(f"API answer for '{message}' failed:", e)
+        return {"intent": None, "error": "Something went wrong answering this message."}
+
+# JSON batch API: POST {"messages": ["restaurants in dallas", ...]} (or {"message": "..."})
+# and get {"results": [{"message", "intent", "items", "joke", "fact", "html"}, ...]}
+# in the same order. Identical messages (ignoring case) are answered once.
+@app.route("/api/chat", methods=["POST"])
+def api_chat():
+    payload = request.get_json(silent=True) or {}
+    if not isinstance(payload, dict):
+        return jsonify({"error": API_USAGE}), 400
+    messages = payload.get("messages")
+    if messages is None and "message" in payload:
+        messages = [payload["message"]]
+    if not isinstance(messages, list) or not all(isinstance(message, str) for message in messages):
+        return jsonify({"error": API_USAGE}), 400
+    if len(messages) > API_BATCH_LIMIT:
+        return jsonify({"error": f"At most {API_BATCH_LIMIT} messages per request."}), 400
+    unique = list(dict.fromkeys(message.lower() for message in messages))
+    # Messages that time out come back as None (partial results)
+    answers = dict(zip(unique, map_bounded(get_api_result, unique, max_workers=API_BATCH_WORKERS,
+                                           item_timeout=API_ITEM_TIMEOUT, timeout=API_BATCH_TIMEOUT)))
+    results = []
+    for message in messages:
+        answer = answers[message.lower()] or {"intent": None, "error": "No answer in time."}
+        results.append(dict(answer, message=message))
+    return jsonify({"results": results})
+
+# Route for Prometheus-style metrics: upstream latency/status/timeouts per
+# provider and intent, fetch function timings and whole-answer timings
+@app.route("/metrics")
+def metrics_route():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+# Route for health checks: always ready, plus the latest upstream self-check results (if warm-up ran)
+@app.route("/health")
+def health():
+    return jsonify({"status": "ok", "upstreams": warmup.UPSTREAM_HEALTH})
+
+# Optional connectivity self-check: set ACTIVABOT_WARMUP=1 to check every upstream
+# (and warm the connection pool) on a background thread, fill the joke buffer,
+# start building the movie snapshot, import the recipe catalog, pre-warm the
+# event cities and seed the Wikipedia store with the generic fact topics. It
+# never blocks startup.
+if os.getenv("ACTIVABOT_WARMUP") == "1":
+    warmup.start_warmup(UPSTREAM_HEALTH_CHECKS)
+    JOKE_RESERVOIR.start()
+    MOVIE_CATALOG_REFRESHER.start()
+    MEAL_INDEX.start_import(fetch_meals_by_letter)
+    EVENT_PREWARMER.start()
+    threading.Thread(target=seed_wiki_store, name="wiki-seed", daemon=True).start()
+
 # Run the Flask App
 if __name__ == "__main__":
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,39 @@
+# Lazily started background threads
+# The joke buffer, the movie snapshot, the recipe index, the event pre-warmer
+# and the personality watcher each keep themselves fresh from a daemon
+# thread. None of them may start it at import time (loading the app stays
+# free of threads and network I/O), so each one starts its worker the first
+# time it is needed, possibly from several request threads at once.
+# BackgroundWorker is that "start the thread once" step.
+#
+# Set ACTIVABOT_BACKGROUND_JOBS=0 to keep these jobs from starting at all
+# (benchmarks/run_bench.py does, so their upstream calls don't land in its
+# measurements). Workers the app can't answer without, like the async event
+# loop, are marked essential and always start.
+import os
+import threading
+
+BACKGROUND_JOBS = os.getenv("ACTIVABOT_BACKGROUND_JOBS", "1") != "0"
+
+
+class BackgroundWorker:
+    def __init__(self, target, name, args=(), essential=False):
+        self.target = target
+        self.name = name
+        self.args = args
+        self.essential = essential
+        self._lock = threading.Lock()
+        self._thread = None
+
+    # Function to start the daemon thread (safe to call many times; only the first call does anything)
+    def start(self):
+        if self._thread is not None or not (self.essential or BACKGROUND_JOBS):
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self.target, args=self.args, name=self.name, daemon=True)
+                self._thread.start()
+
+    # Function to check whether the thread has been started
+    def started(self):
+        return self._thread is not None
@@ -0,0 +1,114 @@
+# Micro-benchmark: cost of picking an intent for one chat message
+# Compares the compiled IntentRouter with the old way of routing, where every
+# message ran the substring checks and freshly built regexes of the if/elif
+# chain. Nothing here touches the network; only routing is timed.
+#
+# Run from the Week3_Chatbot folder:  python benchmarks/bench_router.py
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import INTENT_ROUTER, PERSONALITY  # noqa: E402
+
+MESSAGES = [
+    "hello there",
+    "thanks so much!",
+    "events in dallas",
+    "restaurants near 73019",
+    "places to eat near austin, tx",
+    "breweries in austin",
+    "sights in paris, france",
+    "theaters in miami, ok",
+    "movies in houston",
+    "action movies from 1995",
+    "horror movies from the 1980s",
+    "random movie",
+    "recipes for chicken",
+    "book about science",
+    "tell me about inception",
+    "who directed the matrix",
+    "who starred in titanic",
+    "what should i do this weekend with my friends?",
+    "how to make a bomb",
+]
+
+LEGACY_DANGEROUS = [
+    r"how to (make|build|create|cook|synthesize|prepare) (a )?(bomb|poison|explosive|weapon|drug|meth|overdose)",
+    r"recipe for (poison|explosive|bomb|meth|drugs|overdose)",
+    r"best way to (kill|murder|harm|hurt)",
+    r"where to buy (bomb|poison|drugs|weapon|explosive)",
+    r"how can i (kill|murder|harm|hurt|overdose)"
+]
+LEGACY_INFO = r"(?:get info (?:about|for|on)|tell me about|movie info|info (?:about|for|on)|what is|who is)\s+(.+?)(?:[.?!]|$)"
+LEGACY_DIRECTOR = r"(?:who directed|director(?: of| for| in)?|who is the director of)\s+(.+?)(?:[.?!]|$)"
+LEGACY_STARS = r"(?:who starred in|star(?: of| in)?|stars in|who are the stars of)\s+(.+?)(?:[.?!]|$)"
+
+
+# The routing part of the old get_bot_response, step for step, returning the intent name
+def legacy_route(user_input):
+    text = user_input.lower()
+    is_media_query = any(kw in text for kw in ["book", "novel", "read", "movie", "film", "show", "series", "documentary"])
+    is_info_query = any(kw in text for kw in ["who is", "what is", "tell me about", "info about", "information about"])
+    if not (is_media_query or is_info_query):
+        for pattern in LEGACY_DANGEROUS:
+            if re.search(pattern, text):
+                return "dangerous"
+    if any(word in text for word in PERSONALITY.phrases("goodbye_keywords")):
+        return "goodbye"
+    if any(re.search(rf"\b{re.escape(word)}\b", text) for word in PERSONALITY.phrases("thanks_keywords")):
+        return "thanks"
+    for word in PERSONALITY.phrases("greeting_keywords"):
+        if re.search(rf"\b{re.escape(word)}\b", text):
+            return "greeting"
+    if "help" in text or "directions" in text:
+        return "help"
+    if re.search(LEGACY_INFO, text):
+        return "movie_info"
+    if re.search(LEGACY_DIRECTOR, text):
+        return "director"
+    if re.search(LEGACY_STARS, text):
+        return "stars"
+    if any(kw in text for kw in ["where can i eat", "places to eat", "good food", "restaurants near",
+                                 "places to eat near", "restaurants in", "restaurant in", "food in"]):
+        return "restaurants"
+    if "events in" in text:
+        return "events"
+    if "sights" in text or "tourist" in text:
+        return "sights"
+    if "breweries in" in text:
+        return "breweries"
+    if "recipes for" in text or "recipes with" in text or "recipes using" in text:
+        return "recipes"
+    if "movies in" in text or "movies near" in text:
+        return "movies_in"
+    if "movie" in text:
+        return "movies"
+    if "theaters" in text or "cinemas" in text:
+        return "theaters"
+    if "book" in text or "read" in text or "novel" in text:
+        return "books"
+    if "hello" in text:
+        return "hello"
+    return "fallback"
+
+
+def compiled_route(user_input):
+    return INTENT_ROUTER.route(user_input.lower())[0]
+
+
+def main():
+    mismatches = [m for m in MESSAGES if legacy_route(m) != compiled_route(m)]
+    if mismatches:
+        print("Router disagrees with the legacy chain on:", mismatches)
+    rounds = 2000
+    for name, route in [("legacy if/elif chain", legacy_route), ("compiled IntentRouter", compiled_route)]:
+        seconds = timeit.timeit(lambda: [route(m) for m in MESSAGES], number=rounds)
+        per_message_us = seconds / (rounds * len(MESSAGES)) * 1e6
+        print(f"{name:<24} {per_message_us:8.2f} µs/message")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+# End-to-end latency benchmark against the offline stub server
+# Starts benchmarks/stub_server.py in-process, points the app at it, then
+# drives get_bot_response for each intent and reports p50/p95/p99 latency
+# and throughput. Nothing touches the real APIs.
+#
+# By default every message starts with empty caches (cold), so messages are
+# sent one at a time: clearing the shared caches while other messages are in
+# flight would leave none of them cold. Pass --warm to keep the caches between
+# messages and send --concurrency messages at once.
+#
+# The app's background jobs (joke refill, movie snapshot, recipe import, event
+# pre-warm) are switched off, so only the benchmarked messages call the stub.
+# Upstream calls are reported per intent.
+#
+# Run from the Week3_Chatbot folder:
+#   python benchmarks/run_bench.py
+#   python benchmarks/run_bench.py --requests 50 --concurrency 8 --latency-ms 150 --error-rate 0.05
+#   python benchmarks/run_bench.py --intents events restaurants --json results.json
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_server import add_profile_arguments, profiles_from_args, start_stub_server  # noqa: E402
+
+# Intent -> messages to send (cycled through)
+MESSAGES = {
+    "events": ["events in dallas", "events in chicago", "events in denver"],
+    "restaurants": ["restaurants in dallas", "places to eat near 75001", "restaurants in austin, tx"],
+    "sights": ["sights in paris", "sights in boston", "tourist spots near 94103"],
+    "movies_in": ["movies in houston", "movies in seattle"],
+    "movies": ["comedy movies", "action movies from 1995", "horror movies from the 1980s", "random movie"],
+    "recipes": ["recipes with chicken", "recipes for pasta", "recipes using beef"],
+    "books": ["book about science", "books by agatha christie", "book genre mystery"],
+}
+
+
+# Function to pick the value at percentile p (0-100) of sorted values (nearest rank)
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+# Function to reset every cache the app keeps, so each message runs cold
+def clear_caches(app):
+    import cache
+    for store in cache.CACHES.values():
+        store.clear()
+    app.GEOCODE_STORE.clear()
+    app.WIKI_STORE.clear()
+    app.MOVIE_CATALOG.clear()
+    app.MEAL_INDEX.clear()
+
+
+# Function to send one message and time it. Returns (seconds, error or None).
+def timed_message(app, message, warm):
+    if not warm:
+        clear_caches(app)
+    started = time.perf_counter()
+    try:
+        app.get_bot_response(message)
+        error = None
+    except Exception as e:
+        error = repr(e)
+    return time.perf_counter() - started, error
+
+
+# Function to benchmark one intent: run requests messages, concurrency at a time
+def bench_intent(app, intent, requests, concurrency, warm, counts):
+    messages = [MESSAGES[intent][i % len(MESSAGES[intent])] for i in range(requests)]
+    calls_before = dict(counts)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(lambda message: timed_message(app, message, warm), messages))
+    wall = time.perf_counter() - started
+    calls = {provider: count - calls_before.get(provider, 0) for provider, count in sorted(counts.items())
+             if count > calls_before.get(provider, 0)}
+    latencies = sorted(seconds * 1000 for seconds, error in outcomes)
+    return {
+        "intent": intent,
+        "requests": requests,
+        "errors": sum(1 for seconds, error in outcomes if error),
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p95_ms": round(percentile(latencies, 95), 1),
+        "p99_ms": round(percentile(latencies, 99), 1),
+        "max_ms": round(latencies[-1], 1) if latencies else 0.0,
+        "throughput_rps": round(requests / wall, 2) if wall else 0.0,
+        "upstream_calls": calls,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end chat latency benchmark (offline)")
+    parser.add_argument("--intents", nargs="+", default=list(MESSAGES), choices=list(MESSAGES))
+    parser.add_argument("--requests", type=int, default=30, help="messages per intent")
+    parser.add_argument("--concurrency", type=int, default=4, help="messages in flight at once (--warm only)")
+    parser.add_argument("--warm", action="store_true", help="keep caches between messages")
+    parser.add_argument("--json", help="also write the results to this JSON file")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    if not args.warm:
+        args.concurrency = 1
+
+    server, base_url = start_stub_server(profiles=profiles_from_args(args))
+    # Configure the app before importing it: stub upstreams, throwaway data files, dummy keys
+    os.environ["ACTIVABOT_UPSTREAM_URL"] = base_url
+    data_dir = tempfile.mkdtemp(prefix="activabot-bench-")
+    os.environ["GEOCODE_DB_PATH"] = os.path.join(data_dir, "geocode.sqlite3")
+    os.environ["WIKI_DB_PATH"] = os.path.join(data_dir, "wiki.sqlite3")
+    os.environ["MOVIE_CATALOG_PATH"] = os.path.join(data_dir, "movie_catalog.sqlite3")
+    os.environ["MEAL_INDEX_PATH"] = os.path.join(data_dir, "meals.sqlite3")
+    os.environ["ACTIVABOT_BACKGROUND_JOBS"] = "0"
+    for key in ("TICKETMASTER_CONSUMER_KEY", "GEOAPIFY_API_KEY", "TMDB_API_KEY", "OMDB_API_KEY"):
+        os.environ.setdefault(key, "bench")
+    import app
+
+    # Check that every message routes to the intent it is filed under
+    for intent in args.intents:
+        for message in MESSAGES[intent]:
+            routed, _ = app.INTENT_ROUTER.route(message)
+            if routed != intent:
+                sys.exit(f"'{message}' routes to {routed}, not {intent}")
+
+    print(f"Stub upstreams at {base_url}: {args.distribution} latency, median {args.latency_ms} ms, "
+          f"error rate {args.error_rate}; {'warm' if args.warm else 'cold'} caches, "
+          f"{args.requests} messages per intent, concurrency {args.concurrency}")
+    print(f"{'intent':<12} {'n':>4} {'err':>4} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9} {'msg/s':>8}")
+    results = []
+    for intent in args.intents:
+        # The app logs every upstream call; keep the report readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = bench_intent(app, intent, args.requests, args.concurrency, args.warm,
+                                  server.RequestHandlerClass.counts)
+        results.append(result)
+        print(f"{intent:<12} {result['requests']:>4} {result['errors']:>4} {result['p50_ms']:>9} {result['p95_ms']:>9} "
+              f"{result['p99_ms']:>9} {result['max_ms']:>9} {result['throughput_rps']:>8}")
+    for result in results:
+        print(f"Upstream calls for {result['intent']}:", result["upstream_calls"])
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"settings": vars(args), "results": results}, f, indent=2)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
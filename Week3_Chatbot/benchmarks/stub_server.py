@@ -0,0 +1,297 @@
+# Offline stand-in for every upstream API the bot calls
+# Serves made-up but correctly shaped JSON for TMDb, OMDb, Ticketmaster,
+# Geoapify, Open Brewery DB, TheMealDB, Google Books, Open Library, Wikipedia
+# and JokeAPI, so the bot can be benchmarked without the network or API keys.
+# Each provider gets its own latency distribution and error rate.
+#
+# The app sends its calls here when ACTIVABOT_UPSTREAM_URL is set (see
+# upstream.py). Requests arrive as /<original host>/<original path>, e.g.
+# /api.themoviedb.org/3/movie/popular.
+#
+# Run from the Week3_Chatbot folder:
+#   python benchmarks/stub_server.py --port 8765 --latency-ms 120 --error-rate 0.02
+#   ACTIVABOT_UPSTREAM_URL=http://127.0.0.1:8765 python app.py
+import argparse
+import datetime
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# Upstream host -> provider name used in the latency/error profile
+PROVIDERS = {
+    "api.themoviedb.org": "tmdb",
+    "www.omdbapi.com": "omdb",
+    "app.ticketmaster.com": "ticketmaster",
+    "api.geoapify.com": "geoapify",
+    "api.openbrewerydb.org": "openbrewerydb",
+    "www.themealdb.com": "themealdb",
+    "www.googleapis.com": "google_books",
+    "openlibrary.org": "openlibrary",
+    "en.wikipedia.org": "wikipedia",
+    "v2.jokeapi.dev": "jokeapi",
+}
+
+# Default profile for every provider. Latency is drawn from a distribution:
+#   fixed:       always median_ms
+#   uniform:     between min_ms and max_ms
+#   lognormal:   median median_ms, spread sigma (a long right tail, like real APIs)
+#   exponential: mean median_ms
+DEFAULT_PROFILE = {"distribution": "lognormal", "median_ms": 80, "sigma": 0.5, "error_rate": 0.0}
+
+WORDS = ["Golden", "River", "Night", "Garden", "Silver", "Harbor", "Maple", "Echo", "Summit", "Lantern",
+         "Copper", "Velvet", "North", "Ember", "Willow", "Cedar", "Atlas", "Juniper", "Comet", "Prairie"]
+
+
+# Function to draw one latency (seconds) from a provider profile
+def sample_latency(profile):
+    distribution = profile.get("distribution", "lognormal")
+    median = profile.get("median_ms", 80) / 1000
+    if distribution == "fixed":
+        seconds = median
+    elif distribution == "uniform":
+        seconds = random.uniform(profile.get("min_ms", 0) / 1000, profile.get("max_ms", 2 * median * 1000) / 1000)
+    elif distribution == "exponential":
+        seconds = random.expovariate(1 / median) if median > 0 else 0
+    else:
+        seconds = random.lognormvariate(0, profile.get("sigma", 0.5)) * median
+    return max(0.0, seconds)
+
+
+# Function to make up a short title like "Silver Harbor"
+def fake_title(seed, index):
+    rng = random.Random(f"{seed}-{index}")
+    return f"{rng.choice(WORDS)} {rng.choice(WORDS)}"
+
+
+def tmdb(path, query):
+    if path.endswith("/search/movie"):
+        title = query.get("query", "Unknown")
+        year = query.get("year", "2010")
+        return 200, {"results": [{"id": 1000 + len(title), "title": title, "release_date": f"{year}-06-01"}]}
+    if path.endswith("/movie/popular") or path.endswith("/discover/movie"):
+        seed = query.get("with_genres", "") + query.get("primary_release_year", "") + query.get("page", "")
+        year = query.get("primary_release_year", "2020")
+        return 200, {"results": [
+            {"id": 500 + i, "title": fake_title(seed or "popular", i), "release_date": f"{year}-01-01"}
+            for i in range(20)
+        ]}
+    return 200, {"images": {}}
+
+
+def omdb(path, query):
+    if "s" in query:
+        return 200, {"Search": [{"Title": fake_title(query["s"], i)} for i in range(5)], "Response": "True"}
+    title = query.get("t", "Unknown")
+    return 200, {
+        "Response": "True", "Title": title, "Year": query.get("y", "2001"), "imdbRating": "7.4",
+        "Plot": f"{title} is a film about something.", "Director": "Jane Director", "Actors": "Actor One, Actor Two",
+        "Genre": "Drama", "Awards": "2 wins", "BoxOffice": "$12,000,000", "Runtime": "112 min",
+        "Country": "USA", "Language": "English", "Released": "01 Jun 2001", "Writer": "Sam Writer",
+    }
+
+
+def ticketmaster(path, query):
+    city = query.get("city", "anywhere")
+    today = datetime.date.today()
+    # One event a day, starting yesterday, so a listing has events that have passed
+    return 200, {"_embedded": {"events": [
+        {"name": f"{fake_title(city, i)} Live", "url": f"https://www.ticketmaster.com/event/{i}",
+         "dates": {"start": {"localDate": (today + datetime.timedelta(days=i - 1)).isoformat()}}}
+        for i in range(int(query.get("size", 10)))
+    ]}}
+
+
+def geoapify(path, query):
+    if path.endswith("/geocode/search"):
+        rng = random.Random(query.get("text", ""))
+        lon, lat = rng.uniform(-120, -70), rng.uniform(25, 48)
+        return 200, {"features": [{"geometry": {"type": "Point", "coordinates": [lon, lat]},
+                                   "properties": {"formatted": query.get("text", ""), "lon": lon, "lat": lat}}]}
+    seed = query.get("categories", "") + query.get("filter", "")
+    # Places spread over the inner third of the circle, nearest first (like bias=proximity)
+    lon, lat, radius = (float(part) for part in query.get("filter", "circle:0,0,1000")[len("circle:"):].split(","))
+    rng = random.Random(seed)
+    offsets = sorted(rng.uniform(0, radius / 3) for _ in range(int(query.get("limit", 15))))
+    return 200, {"features": [
+        {"geometry": {"type": "Point", "coordinates": [lon, lat + meters / 111320]},
+         "properties": {"name": fake_title(seed, i), "formatted": f"{100 + i} Main St"}}
+        for i, meters in enumerate(offsets)
+    ]}
+
+
+def openbrewerydb(path, query):
+    city = query.get("by_city", "anywhere")
+    return 200, [{"name": f"{fake_title(city, i)} Brewing", "address_1": f"{10 + i} Hops Ave", "city": city}
+                 for i in range(int(query.get("per_page", 15)))]
+
+
+INGREDIENTS = ["Chicken", "Chicken Breast", "Chickpeas", "Tomatoes", "Onion", "Garlic", "Rice", "Beef",
+               "Potatoes", "Cheese", "Eggs", "Lentils", "Spinach", "Salmon", "Butter", "Flour"]
+
+
+def themealdb(path, query):
+    term = query.get("i") or query.get("s") or query.get("f") or "meal"
+    meals = []
+    for i in range(12):
+        rng = random.Random(f"{term}-{i}")
+        meal = {"strMeal": f"{term.title()} {fake_title(term, i)}", "idMeal": str(52000 + i)}
+        if "f" in query:
+            # Bulk import: each letter has its own meals, with their ingredients
+            meal["idMeal"] = str(52000 + 100 * (ord(term[0]) - ord("a")) + i)
+            for n, ingredient in enumerate(rng.sample(INGREDIENTS, 5), start=1):
+                meal[f"strIngredient{n}"] = ingredient
+        meals.append(meal)
+    return 200, {"meals": meals}
+
+
+# Both book catalogs draw from the same fake shelf: Open Library starts halfway
+# into Google's list, so about half of the books overlap (same title and ISBN)
+def fake_isbn(seed, index):
+    return f"978{random.Random(f'{seed}-{index}').randrange(10 ** 9):09d}{index % 10}"
+
+
+def google_books(path, query):
+    seed = query.get("q", "").split(":", 1)[-1]
+    return 200, {"items": [
+        {"volumeInfo": {"title": fake_title(seed, i), "authors": ["A. Writer"], "infoLink": f"https://books.google.com/{i}",
+                        "industryIdentifiers": [{"type": "ISBN_13", "identifier": fake_isbn(seed, i)}]}}
+        for i in range(int(query.get("maxResults", 10)))
+    ]}
+
+
+def openlibrary(path, query):
+    seed = query.get("subject") or query.get("author") or ""
+    limit = int(query.get("limit", 10))
+    return 200, {"docs": [
+        {"title": fake_title(seed, i), "author_name": ["A. Writer"], "first_publish_year": 1990 + i,
+         "key": f"/works/OL{i}W", "isbn": [fake_isbn(seed, i)]}
+        for i in range(limit // 2, limit // 2 + limit)
+    ]}
+
+
+def wikipedia(path, query):
+    topic = path.rsplit("/", 1)[-1].replace("_", " ")
+    return 200, {"extract": f"{topic} is a topic with a long history. Many people find {topic} interesting."}
+
+
+def jokeapi(path, query):
+    amount = int(query.get("amount", 1))
+    jokes = [{"joke": f"Stub joke number {random.randint(1, 10 ** 6)}."} for i in range(amount)]
+    return 200, ({"jokes": jokes} if amount > 1 else jokes[0])
+
+
+# Provider name -> function(path, query) -> (status, JSON payload)
+RESPONDERS = {
+    "tmdb": tmdb,
+    "omdb": omdb,
+    "ticketmaster": ticketmaster,
+    "geoapify": geoapify,
+    "openbrewerydb": openbrewerydb,
+    "themealdb": themealdb,
+    "google_books": google_books,
+    "openlibrary": openlibrary,
+    "wikipedia": wikipedia,
+    "jokeapi": jokeapi,
+}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # Set by make_server: provider name -> profile, plus per-provider request counts
+    profiles = {}
+    counts = {}
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real APIs
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        host, _, path = parts.path.lstrip("/").partition("/")
+        provider = PROVIDERS.get(host)
+        if provider is None:
+            self.send_json(404, {"error": f"unknown upstream host {host}"})
+            return
+        self.counts[provider] = self.counts.get(provider, 0) + 1
+        profile = self.profiles.get(provider, DEFAULT_PROFILE)
+        time.sleep(sample_latency(profile))
+        if random.random() < profile.get("error_rate", 0.0):
+            self.send_json(503, {"error": "stub error"})
+            return
+        query = {key: values[0] for key, values in parse_qs(parts.query, keep_blank_values=True).items()}
+        status, payload = RESPONDERS[provider]("/" + path, query)
+        self.send_json(status, payload)
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client gave up (timed out) before the answer was ready
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default listen backlog (5) drops bursts of new connections, and the
+    # client's SYN retry then adds a whole second to the measured latency
+    request_queue_size = 256
+
+
+# Function to build a profile for every provider from defaults plus per-provider overrides
+def build_profiles(default=None, overrides=None):
+    default = dict(DEFAULT_PROFILE, **(default or {}))
+    overrides = overrides or {}
+    return {provider: dict(default, **overrides.get(provider, {})) for provider in RESPONDERS}
+
+
+# Function to create the stub server (port 0 picks a free port)
+def make_server(host="127.0.0.1", port=0, profiles=None):
+    handler = type("ConfiguredStubHandler", (StubHandler,), {"profiles": profiles or build_profiles(), "counts": {}})
+    return StubServer((host, port), handler)
+
+
+# Function to start the stub server on a daemon thread. Returns (server, base_url).
+def start_stub_server(host="127.0.0.1", port=0, profiles=None):
+    server = make_server(host, port, profiles)
+    threading.Thread(target=server.serve_forever, name="stub-server", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+# Function to add the latency/error command-line options (shared with run_bench.py)
+def add_profile_arguments(parser):
+    parser.add_argument("--distribution", default=DEFAULT_PROFILE["distribution"],
+                        choices=["fixed", "uniform", "lognormal", "exponential"])
+    parser.add_argument("--latency-ms", type=float, default=DEFAULT_PROFILE["median_ms"],
+                        help="median (or fixed/mean) latency per upstream call")
+    parser.add_argument("--sigma", type=float, default=DEFAULT_PROFILE["sigma"], help="lognormal spread")
+    parser.add_argument("--error-rate", type=float, default=DEFAULT_PROFILE["error_rate"],
+                        help="share of calls answered with 503")
+    parser.add_argument("--profile", help='JSON file with per-provider overrides, e.g. {"wikipedia": {"median_ms": 400}}')
+
+
+# Function to turn parsed command-line options into provider profiles
+def profiles_from_args(args):
+    default = {"distribution": args.distribution, "median_ms": args.latency_ms, "sigma": args.sigma,
+               "error_rate": args.error_rate}
+    overrides = {}
+    if args.profile:
+        with open(args.profile, encoding="utf-8") as f:
+            overrides = json.load(f)
+    return build_profiles(default, overrides)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline stand-in for the bot's upstream APIs")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    server = make_server(args.host, args.port, profiles_from_args(args))
+    print(f"Stub upstream server on http://{args.host}:{args.port} (set ACTIVABOT_UPSTREAM_URL to this)")
+    server.serve_forever()
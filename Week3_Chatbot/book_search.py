@@ -0,0 +1,123 @@
+# Multi-provider book search
+# The book intent asks Google Books and Open Library at the same time. The two
+# catalogs overlap a lot, and listing both answers one after the other showed
+# the same book twice. BookMerger folds the answers into one list: two books
+# are the same when they share an ISBN, or when their normalized title and
+# first author's last name match. collect_books adds each provider's books as
+# soon as that provider answers and returns once enough unique books are in,
+# without waiting for a slow provider.
+#
+# A book is a dict: title, authors (list), year, link, isbns (list) and
+# sources (provider names that returned it).
+import asyncio
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fanout import iter_ready, run_async, submit_all
+
+# How many unique books make a full answer
+BOOKS_WANTED = 8
+
+# How long (seconds) to wait for the providers before answering with what is in
+BOOK_SEARCH_TIMEOUT = 8
+
+_LEADING_ARTICLE = re.compile(r"^(?:the|a|an)\s+")
+
+
+# Function to normalize a title for matching: lowercase, no punctuation,
+# no subtitle and no leading article ("The Hobbit: Or There and Back Again" -> "hobbit")
+def normalize_title(title):
+    title = (title or "").lower().split(":")[0]
+    title = " ".join(re.sub(r"[^\w\s]", " ", title).split())
+    return _LEADING_ARTICLE.sub("", title)
+
+
+# Function to get the normalized last name of a book's first author
+def author_key(authors):
+    if not authors:
+        return ""
+    words = re.sub(r"[^\w\s]", " ", authors[0].lower()).split()
+    return words[-1] if words else ""
+
+
+# Function to normalize an ISBN (digits and X only)
+def normalize_isbn(isbn):
+    return re.sub(r"[^0-9X]", "", str(isbn).upper())
+
+
+class BookMerger:
+    def __init__(self, limit=BOOKS_WANTED):
+        self.limit = limit
+        self.books = []
+        self._by_key = {}  # (title, author) or ("isbn", isbn) -> book
+
+    def __len__(self):
+        return len(self.books)
+
+    # Function to check whether enough unique books are in
+    def full(self):
+        return len(self.books) >= self.limit
+
+    # Function to add one provider's books. A duplicate fills in what the
+    # first copy is missing and adds its provider to sources.
+    def add(self, books):
+        for book in books or ():
+            keys = [("isbn", normalize_isbn(isbn)) for isbn in book.get("isbns", ()) if isbn]
+            if book.get("title"):
+                keys.append((normalize_title(book["title"]), author_key(book.get("authors"))))
+            existing = next((self._by_key[key] for key in keys if key in self._by_key), None)
+            if existing is None:
+                if self.full():
+                    continue
+                existing = dict(book, sources=list(book.get("sources", ())), isbns=list(book.get("isbns", ())))
+                self.books.append(existing)
+            else:
+                for field in ("year", "link", "authors"):
+                    if not existing.get(field) and book.get(field):
+                        existing[field] = book[field]
+                existing["isbns"] += [isbn for isbn in book.get("isbns", ()) if isbn not in existing["isbns"]]
+                existing["sources"] += [source for source in book.get("sources", ()) if source not in existing["sources"]]
+            for key in keys:
+                self._by_key.setdefault(key, existing)
+
+
+# Function to run the provider searches (name -> zero-argument function
+# returning a list of books) in parallel and merge them as they finish
+def collect_books(providers, wanted=BOOKS_WANTED, timeout=BOOK_SEARCH_TIMEOUT):
+    merger = BookMerger(wanted)
+    # The book search itself runs on the shared EXECUTOR, so its providers get
+    # a pool of their own (like map_bounded) instead of queueing behind it
+    pool = ThreadPoolExecutor(max_workers=len(providers) or 1, thread_name_prefix="books")
+    try:
+        # A provider still running once the list is full is left to finish on its own
+        for name, books in iter_ready(submit_all(providers, pool), timeout=timeout,
+                                      defaults={name: [] for name in providers}):
+            merger.add(books)
+            if merger.full():
+                break
+    finally:
+        pool.shutdown(wait=False)
+    return merger.books
+
+
+# Async version of collect_books. Provider fetchers run their async version.
+async def acollect_books(providers, wanted=BOOKS_WANTED, timeout=BOOK_SEARCH_TIMEOUT):
+    merger = BookMerger(wanted)
+    deadline = time.monotonic() + timeout
+    pending = {asyncio.ensure_future(run_async(task)): name for name, task in providers.items()}
+    while pending and not merger.full():
+        done, _ = await asyncio.wait(list(pending), timeout=max(0, deadline - time.monotonic()),
+                                     return_when=asyncio.FIRST_COMPLETED)
+        if not done:
+            print(f"Book search missed the {timeout}s deadline for", ", ".join(pending.values()))
+            break
+        for future in done:
+            name = pending.pop(future)
+            if future.exception() is not None:
+                print(f"Book provider '{name}' failed:", future.exception())
+            else:
+                merger.add(future.result())
+    for future in pending:
+        future.cancel()
+    return merger.books
@@ -0,0 +1,83 @@
+# Shared in-process cache
+# A small thread-safe cache with a time-to-live per entry and least-recently-
+# used eviction once it is full. "Negative" entries remember that an upstream
+# API had nothing for a key (for example OMDb answering "Response": "False"),
+# so repeat misses don't cost another network call either. They usually get a
+# shorter TTL than real answers.
+import threading
+import time
+from collections import OrderedDict
+
+# Every cache registers itself here so hit rates can be reported in one place
+CACHES = {}
+
+
+class TTLCache:
+    def __init__(self, name, maxsize=1024, ttl=3600, negative_ttl=300):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value, negative)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        CACHES[name] = self
+
+    # Look up a key. Returns (found, value) so a cached None can be told apart
+    # from a miss.
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            expires_at, value, negative = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            if negative:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+            return True, value
+
+    # Store a value. Negative entries use negative_ttl unless ttl is given.
+    def set(self, key, value, negative=False, ttl=None):
+        if ttl is None:
+            ttl = self.negative_ttl if negative else self.ttl
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value, negative)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.negative_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "negative_hits": self.negative_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": (self.hits + self.negative_hits) / lookups if lookups else 0.0,
+            }
+
+
+# Function to get the counters of every registered cache, by cache name
+def cache_stats():
+    return {name: cache.stats() for name, cache in CACHES.items()}
@@ -0,0 +1,72 @@
+# Per-request time budget
+# Every chat answer gets a total budget (REQUEST_BUDGET seconds) when it
+# starts. The deadline lives in a context variable, so every fetch helper can
+# see how much time is left, including helpers running on fan-out threads
+# (fanout.py copies the context) or on the event loop.
+#
+# The budget is for the optional decorations: the joke, the Wikipedia fact
+# and the per-movie fun facts. Their helpers clamp their upstream timeouts to
+# what is left and switch to local personality data once it runs low. The
+# fan-out stops waiting for them when the budget is spent. Core listing calls
+# keep their normal timeouts, so a decoration can never hold a listing
+# hostage, or the other way round.
+import contextlib
+import contextvars
+import os
+import time
+
+REQUEST_BUDGET = float(os.getenv("ACTIVABOT_REQUEST_BUDGET", "1.5"))
+
+# Below this many seconds left, optional helpers don't start new upstream calls
+LOW_BUDGET = 0.3
+
+# No upstream call gets a timeout shorter than this, however little budget is left
+MIN_TIMEOUT = 0.1
+
+# Extra time optional tasks get after the budget ends to hand in their local fallback
+GRACE = 0.1
+
+# monotonic() time the current answer's budget runs out (None outside of an answer)
+_DEADLINE = contextvars.ContextVar("request_deadline", default=None)
+
+
+# Context manager that gives everything inside it a budget of seconds
+@contextlib.contextmanager
+def budget(seconds=REQUEST_BUDGET):
+    token = _DEADLINE.set(time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _DEADLINE.reset(token)
+
+
+# Function to get the seconds left in the current budget (None when there is no budget)
+def remaining():
+    deadline = _DEADLINE.get()
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+
+# Function to check whether the budget is nearly spent
+def running_low(reserve=LOW_BUDGET):
+    left = remaining()
+    return left is not None and left < reserve
+
+
+# Function to shrink a timeout (seconds or (connect, read)) to fit the budget
+def clamp(timeout):
+    left = remaining()
+    if left is None:
+        return timeout
+    left = max(left, MIN_TIMEOUT)
+    if isinstance(timeout, tuple):
+        return tuple(min(part, left) for part in timeout)
+    return min(timeout, left)
+
+
+# Function to work out how long optional tasks may still be waited for
+# (None when there is no budget, so the caller's own deadline applies)
+def optional_wait():
+    left = remaining()
+    return None if left is None else left + GRACE
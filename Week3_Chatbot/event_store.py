@@ -0,0 +1,186 @@
+# Per-city Ticketmaster event store
+# Every "events in <city>" question called Ticketmaster, even though a city's
+# listing only changes over hours. EventStore keeps each city's events in
+# memory, keyed by the normalized city (so "Austin, Texas" and "austin, tx"
+# share one entry), and answers from there until the entry's TTL runs out.
+# Events whose localDate has passed are dropped as they are served, and an
+# entry whose events have all passed counts as a miss.
+#
+# The store also counts how often each city is asked for. EventPrewarmer is a
+# background job that re-fetches the most asked-for cities (topped up with a
+# configured list) shortly before their entries expire, so event questions
+# for popular cities are always answered from memory.
+import datetime
+import threading
+import time
+from collections import OrderedDict
+
+from background import BackgroundWorker
+from cache import CACHES
+from geocode_store import normalize_location
+
+# How long (seconds) a city's events are served before they are fetched again
+EVENT_TTL = 3 * 3600
+
+# How long (seconds) to remember that a city had no events
+NEGATIVE_TTL = 1800
+
+# The pre-warmer keeps this many cities warm, checking every PREWARM_INTERVAL
+# seconds and re-fetching entries that would expire before the next check
+PREWARM_TOP_N = 10
+PREWARM_INTERVAL = 300
+
+
+# Function to drop the events whose localDate has passed (events without a date are kept)
+def upcoming(events, today=None):
+    today = (today or datetime.date.today()).isoformat()
+    return [event for event in events if not event.get("date") or event["date"] >= today]
+
+
+class EventStore:
+    def __init__(self, name, maxsize=1024, ttl=EVENT_TTL, negative_ttl=NEGATIVE_TTL):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries = OrderedDict()  # city key -> {"city", "events", "expires_at"}
+        self._demand = {}  # city key -> [times asked for, city as asked]
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.past_dropped = 0
+        self.evictions = 0
+        CACHES[name] = self
+
+    # Look up a city's upcoming events (dicts with name, date and url).
+    # Returns None on a miss, or when every stored event has passed.
+    def get(self, city):
+        key = normalize_location(city)
+        with self._lock:
+            self._count(key, city)
+            entry = self._entries.get(key)
+            if entry is not None and entry["expires_at"] <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            events = upcoming(entry["events"])
+            if len(events) < len(entry["events"]):
+                self.past_dropped += len(entry["events"]) - len(events)
+                entry["events"] = events
+                if not events:
+                    # Everything we had is over; fetch the city again
+                    del self._entries[key]
+                    self.misses += 1
+                    return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return events
+
+    # Save a city's events and return the upcoming ones. A city with no
+    # upcoming events is remembered for negative_ttl.
+    def put(self, city, events):
+        key = normalize_location(city)
+        stored = upcoming(events)
+        ttl = self.ttl if stored else self.negative_ttl
+        with self._lock:
+            self.past_dropped += len(events) - len(stored)
+            self._entries[key] = {"city": city, "events": stored, "expires_at": time.monotonic() + ttl}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return stored
+
+    # Must be called with the lock held
+    def _count(self, key, city):
+        demand = self._demand.get(key)
+        if demand is None:
+            if len(self._demand) >= self.maxsize:
+                # Forget the least asked-for city to make room
+                del self._demand[min(self._demand, key=lambda other: self._demand[other][0])]
+            self._demand[key] = [1, city]
+        else:
+            demand[0] += 1
+
+    # Function to list the n most asked-for cities (as they were asked for),
+    # topped up from seed_cities
+    def top_cities(self, n, seed_cities=()):
+        with self._lock:
+            ranked = sorted(self._demand.items(), key=lambda item: -item[1][0])
+            cities = [city for key, (count, city) in ranked[:n]]
+        keys = {normalize_location(city) for city in cities}
+        for city in seed_cities:
+            if len(cities) >= n:
+                break
+            if normalize_location(city) not in keys:
+                keys.add(normalize_location(city))
+                cities.append(city)
+        return cities
+
+    # Function to check whether a city's entry is missing or expires within margin seconds
+    def due(self, city, margin):
+        with self._lock:
+            entry = self._entries.get(normalize_location(city))
+            return entry is None or entry["expires_at"] - time.monotonic() <= margin
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._demand.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "expirations": self.expirations,
+                "past_events_dropped": self.past_dropped,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+class EventPrewarmer:
+    def __init__(self, store, fetch_city, seed_cities=(), top_n=PREWARM_TOP_N, interval=PREWARM_INTERVAL):
+        self.store = store
+        self.fetch_city = fetch_city  # function city -> [event dicts], or None on error
+        self.seed_cities = list(seed_cities)
+        self.top_n = top_n
+        self.interval = interval
+        self._worker = BackgroundWorker(self._run, "event-prewarm")
+
+    # Function to start the pre-warm worker (safe to call many times)
+    def start(self):
+        self._worker.start()
+
+    # Function to re-fetch the top cities that would expire before the next
+    # round. Returns how many were stored.
+    def refresh(self):
+        stored = 0
+        # Twice the interval, so a slow round still finishes before entries expire
+        margin = 2 * self.interval
+        for city in self.store.top_cities(self.top_n, self.seed_cities):
+            if not self.store.due(city, margin):
+                continue
+            try:
+                events = self.fetch_city(city)
+            except Exception as e:
+                print("Event pre-warm failed:", e)
+                return stored
+            if events is None:
+                return stored
+            self.store.put(city, events)
+            stored += 1
+        return stored
+
+    def _run(self):
+        while True:
+            self.refresh()
+            time.sleep(self.interval)
@@ -0,0 +1,199 @@
+# Request-level fan-out helpers
+# A chat answer is usually a listing plus a joke plus a Wikipedia fact. Those
+# calls don't depend on each other, so we start them together on a shared
+# thread pool and join them with a deadline. The user then waits for the
+# slowest call instead of the sum of all of them.
+import asyncio
+import contextvars
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# How long (seconds) a fan-out waits for its slowest task before giving up on it
+FANOUT_TIMEOUT = 12
+
+# Limits for batched per-item enrichment (see map_bounded)
+BATCH_WORKERS = 8
+BATCH_ITEM_TIMEOUT = 4
+BATCH_TIMEOUT = 8
+
+# One pool for the whole process, shared by every request
+EXECUTOR = ThreadPoolExecutor(max_workers=32, thread_name_prefix="fanout")
+
+
+# Function to start every task (name -> zero-argument function) on the pool
+# (the shared EXECUTOR unless one is given). Each task runs in a copy of the
+# caller's context, so context variables (like the intent label used by
+# metrics.py) carry over into the worker threads.
+def submit_all(tasks, pool=None):
+    pool = pool or EXECUTOR
+    return {name: pool.submit(contextvars.copy_context().run, task) for name, task in tasks.items()}
+
+
+# Function to work out how long to keep waiting for optional tasks once the
+# core tasks are in: what is left of timeout, or of optional_timeout if shorter
+def _optional_left(started, timeout, optional_timeout):
+    limit = timeout if optional_timeout is None else min(timeout, optional_timeout)
+    return max(0, started + limit - time.monotonic())
+
+
+# Function to wait for started tasks and collect their results by name.
+# Tasks that miss the deadline or raise get their default (None if not given),
+# so one slow or broken API can't take the whole response down with it.
+# Tasks named in optional (decorations like the joke) are only waited for
+# until optional_timeout; the core tasks always get the full timeout.
+def gather(futures, timeout=FANOUT_TIMEOUT, defaults=None, optional=(), optional_timeout=None):
+    defaults = defaults or {}
+    started = time.monotonic()
+    wait([future for name, future in futures.items() if name not in optional], timeout=timeout)
+    wait(list(futures.values()), timeout=_optional_left(started, timeout, optional_timeout))
+    results = {}
+    for name, future in futures.items():
+        if not future.done():
+            future.cancel()
+            print(f"Fan-out task '{name}' missed the {timeout}s deadline")
+            results[name] = defaults.get(name)
+        elif future.exception() is not None:
+            print(f"Fan-out task '{name}' failed:", future.exception())
+            results[name] = defaults.get(name)
+        else:
+            results[name] = future.result()
+    return results
+
+
+# Function to yield (name, result) for started tasks in the order they finish.
+# Tasks still running at the deadline are cancelled and yield their default.
+def iter_ready(futures, timeout=FANOUT_TIMEOUT, defaults=None):
+    defaults = defaults or {}
+    deadline = time.monotonic() + timeout
+    pending = {future: name for name, future in futures.items()}
+    while pending:
+        done, not_done = wait(list(pending), timeout=max(0, deadline - time.monotonic()),
+                              return_when=FIRST_COMPLETED)
+        if not done:
+            break
+        for future in done:
+            name = pending.pop(future)
+            if future.exception() is not None:
+                print(f"Fan-out task '{name}' failed:", future.exception())
+                yield name, defaults.get(name)
+            else:
+                yield name, future.result()
+    for future, name in pending.items():
+        future.cancel()
+        print(f"Fan-out task '{name}' missed the {timeout}s deadline")
+        yield name, defaults.get(name)
+
+
+# Function to run tasks in parallel and return {name: result}
+def run_parallel(tasks, timeout=FANOUT_TIMEOUT, defaults=None, optional=(), optional_timeout=None):
+    return gather(submit_all(tasks), timeout=timeout, defaults=defaults, optional=optional,
+                  optional_timeout=optional_timeout)
+
+
+# Function to run func over every item with at most max_workers in flight.
+# Each item gets item_timeout seconds once it starts and the whole batch gets
+# timeout seconds. Items that fail, time out, or never start come back as
+# default, so callers always get a list lined up with items (partial results).
+def map_bounded(func, items, max_workers=BATCH_WORKERS, item_timeout=BATCH_ITEM_TIMEOUT,
+                timeout=BATCH_TIMEOUT, default=None):
+    items = list(items)
+    results = [default] * len(items)
+    if not items:
+        return results
+    started = {}
+
+    def run(index, item):
+        started[index] = time.monotonic()
+        return func(item)
+
+    # A pool per batch keeps one large batch from starving the shared EXECUTOR
+    pool = ThreadPoolExecutor(max_workers=min(max_workers, len(items)), thread_name_prefix="batch")
+    pending = {pool.submit(contextvars.copy_context().run, run, index, item): index
+               for index, item in enumerate(items)}
+    batch_deadline = time.monotonic() + timeout
+    timed_out = 0
+    while pending:
+        now = time.monotonic()
+        # Drop items that have been running longer than their own timeout
+        for future, index in list(pending.items()):
+            if not future.done() and index in started and now - started[index] >= item_timeout:
+                del pending[future]
+                timed_out += 1
+        if not pending or now >= batch_deadline:
+            break
+        # Sleep until something finishes, an item expires, or the batch ends
+        next_check = batch_deadline
+        for index in pending.values():
+            if index in started:
+                next_check = min(next_check, started[index] + item_timeout)
+        done, _ = wait(list(pending), timeout=max(0, next_check - now), return_when=FIRST_COMPLETED)
+        for future in done:
+            index = pending.pop(future)
+            if future.exception() is not None:
+                print(f"Batch item {index} failed:", future.exception())
+            else:
+                results[index] = future.result()
+    # Whatever is still pending missed the batch deadline
+    timed_out += len(pending)
+    if timed_out:
+        print(f"Batch returned partial results: {timed_out} of {len(items)} items timed out")
+    pool.shutdown(wait=False, cancel_futures=True)
+    return results
+
+
+# Function to run one fan-out task on the event loop. Fetchers (and partials of
+# them) run their async version; anything else runs on a worker thread.
+async def run_async(task):
+    func = getattr(task, "func", task)
+    aio = getattr(func, "aio", None)
+    if aio is not None:
+        return await aio(*getattr(task, "args", ()), **(getattr(task, "keywords", None) or {}))
+    return await asyncio.to_thread(task)
+
+
+# Async version of run_parallel: same tasks, same deadlines and defaults
+async def run_parallel_async(tasks, timeout=FANOUT_TIMEOUT, defaults=None, optional=(), optional_timeout=None):
+    defaults = defaults or {}
+    started = time.monotonic()
+    running = {name: asyncio.ensure_future(run_async(task)) for name, task in tasks.items()}
+    core = [future for name, future in running.items() if name not in optional]
+    if core:
+        await asyncio.wait(core, timeout=timeout)
+    left = [future for future in running.values() if not future.done()]
+    if left:
+        await asyncio.wait(left, timeout=_optional_left(started, timeout, optional_timeout))
+    results = {}
+    for name, future in running.items():
+        if not future.done():
+            future.cancel()
+            print(f"Fan-out task '{name}' missed the {timeout}s deadline")
+            results[name] = defaults.get(name)
+        elif future.exception() is not None:
+            print(f"Fan-out task '{name}' failed:", future.exception())
+            results[name] = defaults.get(name)
+        else:
+            results[name] = future.result()
+    return results
+
+
+# Async version of map_bounded: func is an async function of one item
+async def map_bounded_async(func, items, max_workers=BATCH_WORKERS, item_timeout=BATCH_ITEM_TIMEOUT,
+                            timeout=BATCH_TIMEOUT, default=None):
+    items = list(items)
+    results = [default] * len(items)
+    if not items:
+        return results
+    semaphore = asyncio.Semaphore(max_workers)
+
+    async def run(index, item):
+        async with semaphore:
+            results[index] = await asyncio.wait_for(func(item), item_timeout)
+
+    tasks = [asyncio.ensure_future(run(index, item)) for index, item in enumerate(items)]
+    done, pending = await asyncio.wait(tasks, timeout=timeout)
+    for task in pending:
+        task.cancel()
+    failed = sum(1 for task in done if task.exception() is not None)
+    if pending or failed:
+        print(f"Batch returned partial results: {len(pending) + failed} of {len(items)} items timed out or failed")
+    return results
@@ -0,0 +1,95 @@
+# Persistent geocoding store
+# City coordinates almost never change, so once Geoapify has geocoded a place we
+# keep the answer in a small SQLite file next to the app. It survives restarts
+# and is shared by every worker on the machine. Lookups are keyed by a
+# normalized location string, so "Dallas, Texas", "dallas,  tx" and "DALLAS, TX"
+# all hit the same row. A per-process dict sits in front of SQLite so repeat
+# lookups in the same worker don't even touch the disk.
+import re
+import time
+
+from sqlite_store import SQLiteStore, data_path
+
+GEOCODE_DB_PATH = data_path("GEOCODE_DB_PATH", "geocode.sqlite3")
+
+# Places Geoapify couldn't find are remembered for a day, then retried
+NEGATIVE_TTL = 24 * 3600
+
+US_STATES = {
+    "alabama": "al", "alaska": "ak", "arizona": "az", "arkansas": "ar", "california": "ca",
+    "colorado": "co", "connecticut": "ct", "delaware": "de", "florida": "fl", "georgia": "ga",
+    "hawaii": "hi", "idaho": "id", "illinois": "il", "indiana": "in", "iowa": "ia",
+    "kansas": "ks", "kentucky": "ky", "louisiana": "la", "maine": "me", "maryland": "md",
+    "massachusetts": "ma", "michigan": "mi", "minnesota": "mn", "mississippi": "ms",
+    "missouri": "mo", "montana": "mt", "nebraska": "ne", "nevada": "nv", "new hampshire": "nh",
+    "new jersey": "nj", "new mexico": "nm", "new york": "ny", "north carolina": "nc",
+    "north dakota": "nd", "ohio": "oh", "oklahoma": "ok", "oregon": "or", "pennsylvania": "pa",
+    "rhode island": "ri", "south carolina": "sc", "south dakota": "sd", "tennessee": "tn",
+    "texas": "tx", "utah": "ut", "vermont": "vt", "virginia": "va", "washington": "wa",
+    "west virginia": "wv", "wisconsin": "wi", "wyoming": "wy", "district of columbia": "dc",
+}
+
+
+# Function to turn free-form location text into a canonical cache key
+def normalize_location(text):
+    text = " ".join(text.lower().split())
+    # ZIP+4 codes geocode the same as the plain 5-digit ZIP
+    zip_match = re.fullmatch(r"(\d{5})(?:-\d{4})?", text)
+    if zip_match:
+        return zip_match.group(1)
+    parts = []
+    for part in text.split(","):
+        part = " ".join(re.sub(r"[^\w\s-]", " ", part).split())
+        if not part:
+            continue
+        # Only qualifiers get state abbreviations, so the city "Washington" stays as is
+        parts.append(US_STATES.get(part, part) if parts else part)
+    return ", ".join(parts)
+
+
+class GeocodeStore(SQLiteStore):
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS geocode ("
+        " location TEXT PRIMARY KEY,"
+        " lon REAL,"
+        " lat REAL,"
+        " updated_at REAL NOT NULL)",
+    )
+
+    def __init__(self, path=GEOCODE_DB_PATH):
+        super().__init__(path)
+        self._memory = {}  # key -> (lon, lat), only for places that were found
+
+    # Look up a location. Returns (found, (lon, lat)); a remembered miss is
+    # found with (None, None).
+    def get(self, location):
+        key = normalize_location(location)
+        if key in self._memory:
+            return True, self._memory[key]
+        rows = self._query("SELECT lon, lat, updated_at FROM geocode WHERE location = ?", (key,))
+        if not rows:
+            return False, (None, None)
+        lon, lat, updated_at = rows[0]
+        if lon is None:
+            if time.time() - updated_at > NEGATIVE_TTL:
+                return False, (None, None)
+            return True, (None, None)
+        self._memory[key] = (lon, lat)
+        return True, (lon, lat)
+
+    # Save coordinates for a location (lon/lat of None records a miss)
+    def put(self, location, lon, lat):
+        key = normalize_location(location)
+        self._write(
+            "INSERT OR REPLACE INTO geocode (location, lon, lat, updated_at) VALUES (?, ?, ?, ?)",
+            (key, lon, lat, time.time()),
+        )
+        # Misses stay out of the in-memory layer so they can expire
+        if lon is not None:
+            self._memory[key] = (lon, lat)
+
+    # Forget every stored location (memory and disk)
+    def clear(self):
+        with self._writing() as conn:
+            conn.execute("DELETE FROM geocode")
+            self._memory.clear()
@@ -0,0 +1,78 @@
+# Background joke prefetch buffer
+# Almost every answer ends with a joke, and fetching one from JokeAPI was a
+# blocking round trip on every request. JokeReservoir keeps a bounded queue of
+# jokes that a background thread tops up in batches. Serving a joke is a
+# popleft() and never waits on the network; when the queue is empty pop()
+# returns None and the caller uses its own fallback.
+#
+# The worker thread starts on the first pop(), not at import, so loading the
+# app stays free of network I/O.
+import threading
+from collections import deque
+
+from background import BackgroundWorker
+
+
+class JokeReservoir:
+    def __init__(self, fetch_batch, capacity=50, low_water=15, recent_size=50, idle_refill=300):
+        self.fetch_batch = fetch_batch  # function returning a list of joke strings
+        self.capacity = capacity
+        self.low_water = low_water  # refill once the buffer drops below this
+        self.idle_refill = idle_refill  # also top up every idle_refill seconds
+        self._jokes = deque()
+        self._queued = set()  # jokes currently in the buffer
+        self._recent = deque(maxlen=recent_size)  # jokes served lately, not re-added yet
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._worker = BackgroundWorker(self._run, "joke-refill")
+
+    def __len__(self):
+        return len(self._jokes)
+
+    # Function to take one joke (O(1)). Returns None when the buffer is empty.
+    def pop(self):
+        self.start()
+        with self._lock:
+            joke = self._jokes.popleft() if self._jokes else None
+            if joke is not None:
+                self._queued.discard(joke)
+                self._recent.append(joke)
+            running_low = len(self._jokes) < self.low_water
+        if running_low:
+            self._wakeup.set()
+        return joke
+
+    # Function to add jokes, skipping duplicates. Returns how many were new.
+    def add(self, jokes):
+        added = 0
+        with self._lock:
+            for joke in jokes:
+                if len(self._jokes) >= self.capacity:
+                    break
+                if not joke or joke in self._queued or joke in self._recent:
+                    continue
+                self._jokes.append(joke)
+                self._queued.add(joke)
+                added += 1
+        return added
+
+    # Function to start the refill worker (safe to call many times)
+    def start(self):
+        self._worker.start()
+
+    # Function to fetch batches until the buffer is full or a batch brings nothing new
+    def refill(self):
+        while len(self._jokes) < self.capacity:
+            try:
+                batch = self.fetch_batch()
+            except Exception as e:
+                print("Joke refill failed:", e)
+                return
+            if not self.add(batch):
+                return
+
+    def _run(self):
+        while True:
+            self.refill()
+            self._wakeup.wait(timeout=self.idle_refill)
+            self._wakeup.clear()
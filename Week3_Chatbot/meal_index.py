@@ -0,0 +1,214 @@
+# Local recipe index for TheMealDB
+# TheMealDB's catalog is small (a few hundred meals) and hardly ever changes,
+# yet every recipe question cost a filter.php call, plus a search.php call
+# whenever the ingredient had no exact match. MealIndex imports the whole
+# catalog once (search.php?f=a..z, every meal with its ingredients), keeps it
+# in a small SQLite file next to the app and answers recipe questions from an
+# in-memory inverted index.
+#
+# Words are lowercased and reduced to their singular ("chickens" -> "chicken",
+# "tomatoes" -> "tomato"), and words of 3+ letters also match as prefixes
+# ("chick" -> "chicken"). Meals are ranked:
+#   1. an ingredient that is exactly the query, also with the spaces left out
+#      ("chick pea" finds "Chickpeas")
+#   2. every query word found in the meal's ingredients
+#   3. every query word found in the meal's name
+import bisect
+import json
+import re
+import string
+import time
+from collections import namedtuple
+
+from background import BackgroundWorker
+from sqlite_store import SQLiteStore, data_path
+
+MEAL_INDEX_PATH = data_path("MEAL_INDEX_PATH", "meals.sqlite3")
+
+# Re-import the catalog once the local copy is this old (seconds)
+REIMPORT_AGE = 30 * 24 * 3600
+
+# The importer checks the local copy's age this often (seconds)
+CHECK_INTERVAL = 3600
+
+# Wait this long (seconds) before trying again after a failed import
+RETRY_INTERVAL = 300
+
+# Shortest word that also matches as a prefix
+MIN_PREFIX = 3
+
+_WORD = re.compile(r"[a-z]+")
+
+
+# Function to reduce a word to its singular form
+def singular(word):
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 4 and word.endswith(("oes", "ches", "shes", "sses", "xes")):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us")):
+        return word[:-1]
+    return word
+
+
+# Function to split text into normalized words
+def words(text):
+    return [singular(word) for word in _WORD.findall((text or "").lower())]
+
+
+# One built index. It is never changed after it is built, and a new one replaces
+# it with a single assignment, so a search always sees one consistent catalog.
+#   meals: meal id -> name
+#   phrases: whole ingredient ("chicken breast", "chickenbreast") -> meal ids
+#   ingredient_words, name_words: word -> meal ids (and the words, sorted, for prefix lookups)
+MealSnapshot = namedtuple("MealSnapshot", [
+    "meals", "phrases", "ingredient_words", "name_words", "sorted_ingredient_words", "sorted_name_words",
+])
+
+
+class MealIndex(SQLiteStore):
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS meals ("
+        " id TEXT PRIMARY KEY,"
+        " name TEXT NOT NULL,"
+        " ingredients TEXT NOT NULL)",
+        # One row: when the catalog was last imported
+        "CREATE TABLE IF NOT EXISTS meal_import ("
+        " id INTEGER PRIMARY KEY CHECK (id = 0),"
+        " imported_at REAL NOT NULL)",
+    )
+
+    def __init__(self, path=MEAL_INDEX_PATH):
+        super().__init__(path)
+        self._loaded = False
+        self._snapshot = MealSnapshot({}, {}, {}, {}, [], [])
+        self._importer = None  # BackgroundWorker, made by the first start_import
+
+    # Function to check whether the catalog has been imported
+    def ready(self):
+        self._load()
+        return bool(self._snapshot.meals)
+
+    # The stored catalog is read into the index on first use
+    def _load(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            rows = self._query("SELECT id, name, ingredients FROM meals")
+            self._build([{"id": row[0], "name": row[1], "ingredients": json.loads(row[2])} for row in rows])
+            self._loaded = True
+
+    # Function to build the inverted index from [{"id", "name", "ingredients"}]
+    def _build(self, meals):
+        names = {}
+        phrases = {}
+        ingredient_words = {}
+        name_words = {}
+        for meal in meals:
+            meal_id = meal["id"]
+            names[meal_id] = meal["name"]
+            for ingredient in meal["ingredients"]:
+                ingredient_tokens = words(ingredient)
+                for phrase in (" ".join(ingredient_tokens), "".join(ingredient_tokens)):
+                    phrases.setdefault(phrase, set()).add(meal_id)
+                for word in ingredient_tokens:
+                    ingredient_words.setdefault(word, set()).add(meal_id)
+            for word in words(meal["name"]):
+                name_words.setdefault(word, set()).add(meal_id)
+        # Swap the finished index in all at once
+        self._snapshot = MealSnapshot(names, phrases, ingredient_words, name_words,
+                                      sorted(ingredient_words), sorted(name_words))
+
+    # Function to find the meals with a word, exactly or (for longer words) by prefix
+    def _matching(self, word, table, sorted_words):
+        if len(word) < MIN_PREFIX:
+            return set(table.get(word, ()))
+        found = set()
+        start = bisect.bisect_left(sorted_words, word)
+        for other in sorted_words[start:]:
+            if not other.startswith(word):
+                break
+            found |= table[other]
+        return found
+
+    # Function to find the meals for a query: [(meal id, name)], best matches first
+    def search(self, query, limit=15):
+        self._load()
+        index = self._snapshot  # read once, so a re-import mid-search can't mix two catalogs
+        tokens = words(query)
+        if not tokens or not index.meals:
+            return []
+        exact = index.phrases.get(" ".join(tokens), set()) | index.phrases.get("".join(tokens), set())
+        by_ingredient = set.intersection(*(
+            self._matching(word, index.ingredient_words, index.sorted_ingredient_words) for word in tokens
+        ))
+        by_name = set.intersection(*(
+            self._matching(word, index.name_words, index.sorted_name_words) for word in tokens
+        ))
+        ranked = []
+        seen = set()
+        for tier in (exact, by_ingredient, by_name):
+            for meal_id in sorted(tier - seen, key=lambda meal_id: index.meals[meal_id]):
+                ranked.append((meal_id, index.meals[meal_id]))
+                seen.add(meal_id)
+        return ranked[:limit]
+
+    # Function to import the whole catalog with fetch_letter(letter) -> meals
+    # (or None on error), save it and swap it in. Returns True on success.
+    def import_catalog(self, fetch_letter):
+        meals = {}
+        for letter in string.ascii_lowercase:
+            batch = fetch_letter(letter)
+            if batch is None:
+                print(f"Meal catalog import stopped at '{letter}'")
+                return False
+            for meal in batch:
+                meals[meal["id"]] = meal
+        # One transaction, so a reader never sees half a catalog
+        with self._writing() as conn:
+            conn.execute("DELETE FROM meals")
+            conn.executemany(
+                "INSERT OR REPLACE INTO meals (id, name, ingredients) VALUES (?, ?, ?)",
+                [(meal["id"], meal["name"], json.dumps(meal["ingredients"])) for meal in meals.values()],
+            )
+            conn.execute("INSERT OR REPLACE INTO meal_import (id, imported_at) VALUES (0, ?)", (time.time(),))
+            self._build(list(meals.values()))
+            self._loaded = True
+        print(f"Meal catalog imported: {len(meals)} meals")
+        return True
+
+    # Function to check whether the local copy is missing or old enough to import again
+    def stale(self):
+        rows = self._query("SELECT imported_at FROM meal_import")
+        return not rows or time.time() - rows[0][0] > REIMPORT_AGE
+
+    # Function to start the background importer (safe to call many times).
+    # It imports the catalog if it is missing, then keeps checking and imports
+    # it again once it is REIMPORT_AGE old. Failed imports are retried.
+    def start_import(self, fetch_letter):
+        if self._importer is None:
+            with self._lock:
+                if self._importer is None:
+                    self._importer = BackgroundWorker(self._run_import, "meal-import", args=(fetch_letter,))
+        self._importer.start()
+
+    def _run_import(self, fetch_letter):
+        while True:
+            imported = True
+            if self.stale():
+                try:
+                    imported = self.import_catalog(fetch_letter)
+                except Exception as e:
+                    print("Meal catalog import failed:", e)
+                    imported = False
+            time.sleep(CHECK_INTERVAL if imported else RETRY_INTERVAL)
+
+    # Forget the catalog (memory and disk)
+    def clear(self):
+        with self._writing() as conn:
+            conn.execute("DELETE FROM meals")
+            conn.execute("DELETE FROM meal_import")
+            self._build([])
+            self._loaded = True
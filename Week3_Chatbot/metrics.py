@@ -0,0 +1,146 @@
+# In-process metrics in the Prometheus text format
+# Every upstream HTTP call is timed and counted per provider and per intent
+# (upstream.py records them). Fetch functions and whole chat answers are
+# timed as well. /metrics in app.py serves the lot for Prometheus to scrape.
+#
+# The intent label comes from CURRENT_INTENT, a context variable set while an
+# answer is being built. fanout.py copies the context into its worker
+# threads, so calls made in parallel are still labelled with their intent.
+import bisect
+import contextlib
+import contextvars
+import threading
+import time
+
+# Histogram buckets in seconds, from a fast cache-warm API call up to a timeout
+BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Intent of the answer currently being built ("none" outside of one, e.g. warm-up)
+CURRENT_INTENT = contextvars.ContextVar("intent", default="none")
+
+# Every metric, in the order they are rendered
+REGISTRY = []
+
+
+# Function to escape a label value for the text format
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+# Function to render {name: value} labels as {name="value",...}
+def _labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}  # label values -> count
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames=(), buckets=BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}  # label values -> [per-bucket counts..., +Inf count], sum
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, seconds, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[index] += 1
+            self._values[key] = (counts, total + seconds)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + ("+Inf",), counts):
+                    cumulative += count
+                    le = f'le="{bound}"'
+                    lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {round(total, 6)}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+UPSTREAM_SECONDS = Histogram(
+    "activabot_upstream_request_seconds", "Time spent on one upstream HTTP call.", ("provider", "intent"))
+UPSTREAM_RESPONSES = Counter(
+    "activabot_upstream_responses_total", "Upstream HTTP responses by status code.", ("provider", "intent", "status"))
+UPSTREAM_FAILURES = Counter(
+    "activabot_upstream_failures_total", "Upstream calls that got no response (timeout or error).",
+    ("provider", "intent", "reason"))
+UPSTREAM_COALESCED = Counter(
+    "activabot_upstream_coalesced_total", "Upstream calls answered by an identical call already in flight.",
+    ("provider", "intent"))
+UPSTREAM_CALLS_SAVED = Counter(
+    "activabot_upstream_calls_saved_total", "Upstream calls (and quota) saved by answering from a local cache.",
+    ("provider", "intent", "source"))
+REQUEST_MEMO_HITS = Counter(
+    "activabot_request_memo_hits_total", "Upstream calls answered by the same call made earlier in the same answer.",
+    ("provider", "intent"))
+DEAD_WORK = Counter(
+    "activabot_dead_work_total", "Work done for an answer but never shown: a fan-out task whose result wasn't "
+    "rendered (kind=unrendered) or an upstream call that finished after its answer was sent (kind=late).",
+    ("intent", "kind", "name"))
+FETCHER_SECONDS = Histogram(
+    "activabot_fetcher_seconds", "Time spent in one fetch function, including every call it makes.",
+    ("fetcher", "intent"))
+RESPONSE_SECONDS = Histogram(
+    "activabot_response_seconds", "Time to build one chat answer.", ("intent", "path"))
+
+
+# Function to record one finished upstream call (status) or failed one (reason)
+def record_upstream(provider, seconds, status=None, reason=None):
+    intent = CURRENT_INTENT.get()
+    UPSTREAM_SECONDS.observe(seconds, provider=provider, intent=intent)
+    if reason is None:
+        UPSTREAM_RESPONSES.inc(provider=provider, intent=intent, status=status)
+    else:
+        UPSTREAM_FAILURES.inc(provider=provider, intent=intent, reason=reason)
+
+
+# Context manager that labels everything inside it with intent and times it as one answer
+@contextlib.contextmanager
+def track_response(intent, path):
+    token = CURRENT_INTENT.set(intent)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        RESPONSE_SECONDS.observe(time.perf_counter() - started, intent=intent, path=path)
+        CURRENT_INTENT.reset(token)
+
+
+# Function to render every metric in the Prometheus text format
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
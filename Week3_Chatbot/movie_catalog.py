@@ -0,0 +1,142 @@
+# Local snapshot of TMDb discover results
+# "action movies from 1995" and "random movie" used to call TMDb's
+# /discover/movie on every request. The query space is small: about 20
+# genres (or none) times the years since CATALOG_FIRST_YEAR (or none), each
+# answered by the first page of results sorted by popularity. MovieCatalog
+# keeps those pages in a small SQLite file next to the app, with every page
+# held in memory too, so a genre/year question or a random pick is a dict
+# lookup with no network call.
+#
+# A slice is one (genre_id, year) page, with 0 meaning "any". Slices are served
+# no matter how old they are. CatalogRefresher is a background job that fills
+# in missing slices and re-fetches stale ones a small batch at a time, so the
+# snapshot builds up and stays fresh without bursts of TMDb calls.
+import datetime
+import json
+import time
+
+from background import BackgroundWorker
+from sqlite_store import SQLiteStore, data_path
+
+MOVIE_CATALOG_PATH = data_path("MOVIE_CATALOG_PATH", "movie_catalog.sqlite3")
+
+# Oldest release year in the snapshot
+CATALOG_FIRST_YEAR = 1950
+
+# Slices are re-fetched once they are this old (seconds). Rankings for the
+# current year (and for "any year") move fast, older years hardly at all.
+REFRESH_AGE = 30 * 24 * 3600
+RECENT_REFRESH_AGE = 24 * 3600
+
+# The refresher fetches REFRESH_BATCH slices every REFRESH_INTERVAL seconds
+REFRESH_BATCH = 20
+REFRESH_INTERVAL = 60
+
+
+# Function to list every slice the snapshot covers: (genre_id, year), 0 = any
+def catalog_slices(genre_ids, first_year=CATALOG_FIRST_YEAR):
+    genres = [0] + sorted(set(genre_ids))
+    years = [0] + list(range(datetime.date.today().year, first_year - 1, -1))
+    return [(genre_id, year) for year in years for genre_id in genres]
+
+
+# Function to get how old (seconds) a slice may get before it is re-fetched
+def refresh_age(year):
+    return RECENT_REFRESH_AGE if year in (0, datetime.date.today().year) else REFRESH_AGE
+
+
+class MovieCatalog(SQLiteStore):
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS movie_slices ("
+        " genre_id INTEGER NOT NULL,"
+        " year INTEGER NOT NULL,"
+        " movies TEXT NOT NULL,"
+        " updated_at REAL NOT NULL,"
+        " PRIMARY KEY (genre_id, year))",
+    )
+
+    def __init__(self, path=MOVIE_CATALOG_PATH):
+        super().__init__(path)
+        self._slices = None  # (genre_id, year) -> (movies, updated_at); movies are [title, tmdb_id] pairs
+
+    def __len__(self):
+        return len(self._load())
+
+    # Every slice is read into memory on first use
+    def _load(self):
+        if self._slices is None:
+            with self._lock:
+                if self._slices is None:
+                    rows = self._query("SELECT genre_id, year, movies, updated_at FROM movie_slices")
+                    self._slices = {(row[0], row[1]): (json.loads(row[2]), row[3]) for row in rows}
+        return self._slices
+
+    # Look up a slice. Returns its movies, or None if it isn't in the snapshot yet.
+    def get(self, genre_id, year):
+        entry = self._load().get((genre_id or 0, int(year or 0)))
+        return entry[0] if entry is not None else None
+
+    # Save a slice's movies ([title, tmdb_id] pairs)
+    def put(self, genre_id, year, movies):
+        key = (genre_id or 0, int(year or 0))
+        movies = [[title, tmdb_id] for title, tmdb_id in movies]
+        updated_at = time.time()
+        slices = self._load()
+        with self._writing() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO movie_slices (genre_id, year, movies, updated_at) VALUES (?, ?, ?, ?)",
+                (key[0], key[1], json.dumps(movies), updated_at),
+            )
+        slices[key] = (movies, updated_at)
+
+    # Function to list the slices that need fetching: missing ones first, then
+    # stale ones, oldest first
+    def due(self, slices, limit):
+        now = time.time()
+        stored = self._load()
+        missing = [key for key in slices if key not in stored]
+        stale = sorted(
+            (key for key in slices if key in stored and now - stored[key][1] > refresh_age(key[1])),
+            key=lambda key: stored[key][1],
+        )
+        return (missing + stale)[:limit]
+
+    # Forget every slice (memory and disk)
+    def clear(self):
+        with self._writing() as conn:
+            conn.execute("DELETE FROM movie_slices")
+            self._slices = {}
+
+
+class CatalogRefresher:
+    def __init__(self, catalog, slices, fetch_slice, batch=REFRESH_BATCH, interval=REFRESH_INTERVAL):
+        self.catalog = catalog
+        self.slices = slices
+        self.fetch_slice = fetch_slice  # function (genre_id, year) -> [(title, tmdb_id)], or None on error
+        self.batch = batch
+        self.interval = interval
+        self._worker = BackgroundWorker(self._run, "movie-catalog")
+
+    # Function to start the refresh worker (safe to call many times)
+    def start(self):
+        self._worker.start()
+
+    # Function to fetch one batch of due slices. Returns how many were stored.
+    def refresh(self):
+        stored = 0
+        for genre_id, year in self.catalog.due(self.slices, self.batch):
+            try:
+                movies = self.fetch_slice(genre_id, year)
+            except Exception as e:
+                print("Movie catalog refresh failed:", e)
+                return stored
+            if movies is None:
+                return stored
+            self.catalog.put(genre_id, year, movies)
+            stored += 1
+        return stored
+
+    def _run(self):
+        while True:
+            self.refresh()
+            time.sleep(self.interval)
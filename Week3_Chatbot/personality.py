@@ -0,0 +1,164 @@
+# Compiled, hot-reloadable personality
+# personality.json used to be a raw dict, and every answer picked from it with
+# .get(key, default_list), lowercasing movie titles on each lookup and filling
+# in {bot_name} each time. Personality compiles the file once: lookup keys
+# (titles, actors, topics) are normalized, every phrase is a list, and
+# {bot_name} is already filled in. Lookups are then plain dict gets.
+#
+# PersonalityFile keeps the compiled copy for the file and swaps in a new one
+# when the file's mtime changes. A daemon thread checks the mtime in the
+# background, so requests never touch the file system. The swap is a single
+# reference assignment, and a file that fails to load keeps the old copy.
+import json
+import os
+import random
+import time
+
+from background import BackgroundWorker
+
+# How often (seconds) the watcher checks personality.json for edits
+RELOAD_INTERVAL = float(os.getenv("ACTIVABOT_PERSONALITY_RELOAD", "2"))
+
+DEFAULT_BOT_NAME = "Activabot"
+
+
+# Function to normalize a lookup key (movie title, actor, fact topic)
+def normalize_key(key):
+    return " ".join(str(key).lower().replace("_", " ").split())
+
+
+# Function to turn a value that may be one phrase or a list of them into a tuple
+def _as_phrases(value):
+    if value is None:
+        return ()
+    if isinstance(value, str):
+        return (value,)
+    return tuple(value)
+
+
+class Personality:
+    def __init__(self, raw):
+        self.bot_name = raw.get("bot_name", DEFAULT_BOT_NAME)
+        self.tagline = self._fill(raw.get("tagline", ""))
+        self.about = self._fill(raw.get("about", ""))
+        # Top-level phrase lists: greetings, joke_intros, restaurant_intros, ...
+        self._phrases = {
+            key: tuple(self._fill(phrase) for phrase in value)
+            for key, value in raw.items()
+            if isinstance(value, list)
+        }
+        fact_intros = dict(raw.get("fact_intros", {}))
+        # Custom facts live under fact_intros in personality.json; a top-level
+        # custom_facts section is read too
+        custom_facts = dict(fact_intros.pop("custom_facts", {}))
+        custom_facts.update(raw.get("custom_facts", {}))
+        self._fact_intros = self._index(fact_intros)
+        self._custom_facts = self._index(custom_facts)
+        self._movie_facts = self._index(raw.get("movie_facts", {}))
+        self._movie_opinions = self._index(raw.get("movie_opinions", {}))
+        self._actor_favorites = {
+            normalize_key(actor): self._fill(favorite)
+            for actor, favorite in raw.get("actor_favorites", {}).items()
+        }
+        # OMDb labels stay as written ("BoxOffice"); every intro ends with ":"
+        self._omdb_fact_intros = {
+            label: tuple(intro if intro.endswith(":") else f"{intro}:" for intro in self._fill_all(intros))
+            for label, intros in raw.get("omdb_fact_intros", {}).items()
+        }
+
+    # Function to fill in {bot_name}
+    def _fill(self, text):
+        return text.replace("{bot_name}", self.bot_name)
+
+    def _fill_all(self, value):
+        return tuple(self._fill(phrase) for phrase in _as_phrases(value))
+
+    # Function to build a normalized key -> phrases table
+    def _index(self, section):
+        return {normalize_key(key): self._fill_all(value) for key, value in section.items()}
+
+    # Function to get a top-level phrase list (empty if the file has none)
+    def phrases(self, key):
+        return self._phrases.get(key, ())
+
+    # Function to pick one phrase from a top-level list, or default if it is empty
+    def pick(self, key, default=""):
+        phrases = self._phrases.get(key)
+        return random.choice(phrases) if phrases else default
+
+    # Function to get the fact intros for a topic, followed by the default ones
+    def fact_intros(self, topic=None):
+        intros = self._fact_intros.get("default", ())
+        if topic is not None:
+            intros = self._fact_intros.get(normalize_key(topic), ()) + intros
+        return intros
+
+    # Function to get the custom facts for a topic
+    def custom_facts(self, topic):
+        return self._custom_facts.get(normalize_key(topic), ())
+
+    # Function to get the facts for a movie title
+    def movie_facts(self, title):
+        return self._movie_facts.get(normalize_key(title), ())
+
+    # Function to get the opinions for a movie title
+    def movie_opinions(self, title):
+        return self._movie_opinions.get(normalize_key(title), ())
+
+    # Function to get the favorite-movie line for an actor, or None
+    def actor_favorite(self, actor):
+        return self._actor_favorites.get(normalize_key(actor))
+
+    # Function to get the intros for an OMDb field label (like "Awards")
+    def omdb_fact_intros(self, label):
+        return self._omdb_fact_intros.get(label, ())
+
+
+# Function to load and compile a personality file
+def load_personality(path):
+    with open(path, encoding="utf-8") as f:
+        return Personality(json.load(f))
+
+
+class PersonalityFile:
+    def __init__(self, path, interval=RELOAD_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self._mtime = os.stat(path).st_mtime
+        self.current = load_personality(path)
+        self._listeners = []
+        self._watcher = BackgroundWorker(self._run, "personality-watch")
+
+    # Function to register fn(personality), called after each successful reload
+    def on_reload(self, fn):
+        self._listeners.append(fn)
+
+    # Function to reload the file if its mtime changed. Returns True if it did.
+    def check(self):
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError as e:
+            print("Personality file check failed:", e)
+            return False
+        if mtime == self._mtime:
+            return False
+        self._mtime = mtime
+        try:
+            personality = load_personality(self.path)
+        except Exception as e:
+            print("Personality reload failed, keeping the previous version:", e)
+            return False
+        for listener in self._listeners:
+            listener(personality)
+        self.current = personality
+        print("Personality reloaded from", self.path)
+        return True
+
+    # Function to start the background watcher (safe to call many times)
+    def start(self):
+        self._watcher.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.check()
@@ -0,0 +1,232 @@
+# Spatial cache for Geoapify place searches
+# Restaurants, sights and cinemas are all "places in a circle around a city"
+# searches. Nearby ZIP codes and suburbs geocode to points a few km apart, so
+# they ask for almost the same circle, and every one of them cost a Geoapify
+# call. PlaceCache answers those from memory in two ways:
+#
+#   - by grid cell: the search center is snapped to the center of its geohash
+#     cell (about 5 x 5 km), so every search in the cell sends the very same
+#     request, and the cache keys it by category, cell and radius.
+#   - by superset: a search whose circle lies inside a circle fetched before
+#     is answered by filtering that circle's places locally.
+#
+# A fetched circle (nearest places first, see bias=proximity in app.py) holds
+# every place within its reach: its full radius if the answer came back short
+# of the limit, or otherwise the distance of its farthest place. A circle
+# around q with radius r fits inside when distance(center, q) + r <= reach.
+#
+# Fetched circles are indexed by a coarser geohash cell, so finding the ones
+# that could hold a search only looks at circles nearby.
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from cache import CACHES
+
+# Search centers snap to geohash cells of this precision (about 4.9 x 4.9 km)
+CELL_PRECISION = 5
+
+# Fetched circles are indexed by geohash cells of this precision (about 156 x 156 km)
+INDEX_PRECISION = 3
+
+# Largest radius (meters) a search may use; bounds how far away a circle that
+# could hold a search may be centered
+MAX_RADIUS = 150000
+
+EARTH_RADIUS = 6371000  # meters
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+# Function to encode a point as a geohash of the given precision
+def geohash(lat, lon, precision=CELL_PRECISION):
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True  # geohash bits alternate longitude, latitude
+    while len(chars) < precision:
+        span = lon_range if even else lat_range
+        point = lon if even else lat
+        middle = (span[0] + span[1]) / 2
+        value <<= 1
+        if point >= middle:
+            value |= 1
+            span[0] = middle
+        else:
+            span[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits = 0
+            value = 0
+    return "".join(chars)
+
+
+# Function to get the (lat, lon) center of a geohash cell
+def cell_center(cell):
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    even = True
+    for char in cell:
+        value = _BASE32.index(char)
+        for shift in range(4, -1, -1):
+            span = lon_range if even else lat_range
+            middle = (span[0] + span[1]) / 2
+            if value >> shift & 1:
+                span[0] = middle
+            else:
+                span[1] = middle
+            even = not even
+    return (lat_range[0] + lat_range[1]) / 2, (lon_range[0] + lon_range[1]) / 2
+
+
+# Function to get the size (lat degrees, lon degrees) of a geohash cell of a precision
+def cell_size(precision):
+    lon_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+
+# Function to get the great-circle distance in meters between two points
+def distance(lat1, lon1, lat2, lon2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS * math.asin(min(1.0, math.sqrt(a)))
+
+
+# Function to snap a point to the center of its search cell. Returns (lat, lon).
+def snap_to_cell(lat, lon):
+    return cell_center(geohash(lat, lon, CELL_PRECISION))
+
+
+# Function to list the index cells within meters of a point
+def cells_near(lat, lon, meters, precision=INDEX_PRECISION):
+    lat_step, lon_step = cell_size(precision)
+    dlat = math.degrees(meters / EARTH_RADIUS)
+    dlon = dlat / max(0.01, math.cos(math.radians(lat)))
+    # Sample the bounding box at half a cell, so no cell in it is skipped
+    lat_count = int(2 * dlat / (lat_step / 2)) + 1
+    lon_count = min(int(2 * dlon / (lon_step / 2)) + 1, int(720 / lon_step))
+    cells = set()
+    for i in range(lat_count + 1):
+        sample_lat = max(-90.0, min(90.0, lat - dlat + i * 2 * dlat / lat_count))
+        for j in range(lon_count + 1):
+            sample_lon = (lon - dlon + j * 2 * dlon / lon_count + 180) % 360 - 180
+            cells.add(geohash(sample_lat, sample_lon, precision))
+    return cells
+
+
+class PlaceCache:
+    def __init__(self, name, maxsize=4096, ttl=24 * 3600, negative_ttl=3600):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl  # for circles with no places
+        self._entries = OrderedDict()  # (category, cell, radius) -> entry dict
+        self._index = {}  # (category, index cell) -> set of entry keys
+        self._lock = threading.Lock()
+        self.cell_hits = 0
+        self.superset_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        CACHES[name] = self
+
+    # Look up a search around a snapped center. Returns (source, places) with
+    # source "cell" or "superset", or (None, None) on a miss. Places are
+    # dicts with name, address, lat and lon, nearest first.
+    def get(self, category, lat, lon, radius, limit):
+        cell = geohash(lat, lon, CELL_PRECISION)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._live(self._entries.get((category, cell, radius)), now)
+            if entry is not None and entry["limit"] >= limit:
+                self._entries.move_to_end(entry["key"])
+                self.cell_hits += 1
+                return "cell", entry["places"][:limit]
+            for index_cell in cells_near(lat, lon, MAX_RADIUS):
+                for key in list(self._index.get((category, index_cell), ())):
+                    entry = self._live(self._entries.get(key), now)
+                    if entry is None or entry["reach"] < radius:
+                        continue
+                    if distance(entry["lat"], entry["lon"], lat, lon) + radius <= entry["reach"]:
+                        self._entries.move_to_end(key)
+                        self.superset_hits += 1
+                        return "superset", self._within(entry["places"], lat, lon, radius, limit)
+            self.misses += 1
+        return None, None
+
+    # Save the places a search around a snapped center returned (nearest first).
+    # complete says the answer came back short of its limit, so it holds every
+    # place in the circle; otherwise it only reaches as far as its farthest place.
+    def set(self, category, lat, lon, radius, limit, places, complete):
+        cell = geohash(lat, lon, CELL_PRECISION)
+        key = (category, cell, radius)
+        if complete:
+            reach = radius
+        else:
+            reach = max((distance(lat, lon, place["lat"], place["lon"]) for place in places), default=0)
+        ttl = self.ttl if places else self.negative_ttl
+        entry = {"key": key, "lat": lat, "lon": lon, "limit": limit, "reach": reach,
+                 "places": list(places), "expires_at": time.monotonic() + ttl}
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = entry
+            self._index.setdefault((category, cell[:INDEX_PRECISION]), set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    # Function to return entry if it hasn't expired (expired ones are dropped)
+    def _live(self, entry, now):
+        if entry is None:
+            return None
+        if entry["expires_at"] <= now:
+            self._drop(entry["key"])
+            return None
+        return entry
+
+    def _drop(self, key):
+        if self._entries.pop(key, None) is not None:
+            category, cell, radius = key
+            index_key = (category, cell[:INDEX_PRECISION])
+            self._index[index_key].discard(key)
+            if not self._index[index_key]:
+                del self._index[index_key]
+
+    # Function to pick the places within radius of a point, nearest first
+    def _within(self, places, lat, lon, radius, limit):
+        found = []
+        for place in places:
+            meters = distance(lat, lon, place["lat"], place["lon"])
+            if meters <= radius:
+                found.append((meters, place))
+        found.sort(key=lambda pair: pair[0])
+        return [place for meters, place in found[:limit]]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._index.clear()
+
+    def stats(self):
+        with self._lock:
+            hits = self.cell_hits + self.superset_hits
+            lookups = hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": hits,
+                "cell_hits": self.cell_hits,
+                "superset_hits": self.superset_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                # every hit is a Geoapify call (and a unit of quota) saved
+                "calls_saved": hits,
+                "hit_rate": hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,80 @@
+# Request-scoped memo and dead-work report
+# One chat answer can ask for the same upstream data more than once: the
+# movie info answer looks a title up on OMDb and then picks a fun fact about
+# the same title, and a listing's blocks can share lookups. RequestScope lives
+# for one answer (see scope()) and remembers every upstream response by URL,
+# params and headers, so a repeat within the answer costs nothing. It is kept
+# in a context variable, so fan-out threads and event-loop tasks (which copy
+# the context) share it. Nothing outlives the answer; the TTL caches and
+# stores are still what carry data between answers.
+#
+# The scope also reports dead work: results fetched for the answer but never
+# shown. That is a fan-out task whose result the render left out
+# (kind=unrendered) or an upstream call that only finished after the answer
+# was sent (kind=late). Each one is counted in metrics.DEAD_WORK by intent,
+# and every answer with dead work logs one summary line.
+import contextlib
+import contextvars
+import threading
+
+import metrics
+
+# Scope of the answer currently being built (None outside of one)
+_CURRENT = contextvars.ContextVar("request_scope", default=None)
+
+
+class RequestScope:
+    def __init__(self):
+        self.intent = metrics.CURRENT_INTENT.get()
+        self.closed = False
+        self.dead = []  # (kind, name) noticed while the answer was built
+        self._responses = {}
+        self._lock = threading.Lock()
+
+    # Look up an upstream response made earlier in this answer. Returns (found, response).
+    def lookup(self, key):
+        with self._lock:
+            if key in self._responses:
+                return True, self._responses[key]
+        return False, None
+
+    # Remember an upstream response. One that arrives after the answer was sent is dead work.
+    def store(self, key, response, provider):
+        with self._lock:
+            if not self.closed:
+                self._responses[key] = response
+                return
+        self.discard("late", provider)
+
+    # Record a result that was fetched but never shown
+    def discard(self, kind, name):
+        metrics.DEAD_WORK.inc(intent=self.intent, kind=kind, name=name)
+        with self._lock:
+            if not self.closed:
+                self.dead.append((kind, name))
+
+    # Function to end the scope: drop the remembered responses and log the dead work
+    def close(self):
+        with self._lock:
+            self.closed = True
+            self._responses.clear()
+            dead = list(self.dead)
+        if dead:
+            print(f"Dead work in '{self.intent}' answer:", ", ".join(f"{name} ({kind})" for kind, name in dead))
+
+
+# Function to get the scope of the answer being built, or None
+def current():
+    return _CURRENT.get()
+
+
+# Context manager that gives everything inside it one RequestScope
+@contextlib.contextmanager
+def scope():
+    request = RequestScope()
+    token = _CURRENT.set(request)
+    try:
+        yield request
+    finally:
+        _CURRENT.reset(token)
+        request.close()
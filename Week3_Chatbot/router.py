@@ -0,0 +1,98 @@
+# Precompiled intent router
+# get_bot_response used to lowercase the message and then run dozens of
+# separate substring checks and freshly built regexes, in if/elif order, for
+# every message. IntentRouter compiles every trigger keyword into a single
+# alternation regex once, at load time. One scan of the message finds every
+# keyword it contains. Rules are then checked in priority order against that
+# set, and the first rule that fires names the intent.
+#
+# A rule fires when:
+#   - any of its keywords appears as a substring, or any of its whole_words
+#     appears with word boundaries on both sides (like \bword\b), and
+#   - none of its "unless" flags were seen, and
+#   - its confirm regex (if any) matches. This is for intents that need to
+#     capture something, like a movie title. Its keywords must be literal
+#     text every confirm match contains, so the regex only runs when it can
+#     possibly match.
+import re
+
+_WORD_CHAR = re.compile(r"\w")
+
+
+# Function to check the \b rule at position i of text
+def _is_boundary(text, i):
+    before = i > 0 and _WORD_CHAR.match(text[i - 1]) is not None
+    after = i < len(text) and _WORD_CHAR.match(text[i]) is not None
+    return before != after
+
+
+class IntentRouter:
+    def __init__(self, fallback="fallback"):
+        self.fallback = fallback
+        self._rules = []  # (intent, keywords, whole_words, unless, confirm) in priority order
+        self._flags = {}  # flag name -> keywords
+        self._scanner = None
+
+    # Add a named flag: a set of keywords rules can use in "unless"
+    def add_flag(self, name, keywords):
+        self._flags[name] = frozenset(keywords)
+        self._scanner = None
+
+    # Add a rule. Rules added first win.
+    def add(self, intent, keywords=(), whole_words=(), unless=(), confirm=None):
+        if isinstance(confirm, str):
+            confirm = re.compile(confirm)
+        self._rules.append((intent, frozenset(keywords), tuple(whole_words), frozenset(unless), confirm))
+        self._scanner = None
+
+    # Function to build the combined scanner and keyword lookup tables
+    def compile(self):
+        keywords = set()
+        for name, flag_keywords in self._flags.items():
+            keywords.update(flag_keywords)
+        for intent, rule_keywords, whole_words, unless, confirm in self._rules:
+            keywords.update(rule_keywords)
+            keywords.update(whole_words)
+        keywords.discard("")
+        # Longest first, so at each position the scanner reports the longest keyword.
+        # Every shorter keyword matching at that same position is a prefix of it.
+        ordered = sorted(keywords, key=lambda k: (-len(k), k))
+        self._prefixes = {
+            keyword: [other for other in ordered if keyword.startswith(other)]
+            for keyword in ordered
+        }
+        # Zero-width lookahead so overlapping keywords at later positions are still seen
+        alternation = "|".join(re.escape(k) for k in ordered) or "(?!)"
+        self._scanner = re.compile(f"(?=({alternation}))")
+        return self
+
+    # Function to find every keyword in text: keyword -> list of start positions
+    def scan(self, text):
+        if self._scanner is None:
+            self.compile()
+        found = {}
+        for m in self._scanner.finditer(text):
+            start = m.start()
+            for keyword in self._prefixes[m.group(1)]:
+                found.setdefault(keyword, []).append(start)
+        return found
+
+    # Function to classify text. Returns (intent, confirm_match_or_None).
+    def route(self, text):
+        found = self.scan(text)
+        seen = found.keys()
+        flags = {name for name, flag_keywords in self._flags.items() if not seen.isdisjoint(flag_keywords)}
+        for intent, keywords, whole_words, unless, confirm in self._rules:
+            triggered = not seen.isdisjoint(keywords) or any(
+                _is_boundary(text, start) and _is_boundary(text, start + len(word))
+                for word in whole_words
+                for start in found.get(word, ())
+            )
+            if not triggered or not flags.isdisjoint(unless):
+                continue
+            if confirm is None:
+                return intent, None
+            match = confirm.search(text)
+            if match:
+                return intent, match
+        return self.fallback, None
@@ -0,0 +1,64 @@
+# Single-flight coalescing of identical concurrent calls
+# When many users ask the same thing at once ("events in dallas"), every
+# request used to make the same upstream call at the same time. SingleFlight
+# lets the first caller for a key (the leader) make the call while everyone
+# else asking for that key meanwhile waits for, and shares, its result or
+# error. Nothing is kept once the call finishes; repeat lookups over time are
+# the caches' job.
+import asyncio
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}  # key -> _Call in flight on some thread
+        self._tasks = {}  # (event loop, key) -> asyncio task in flight on that loop
+
+    # Function to run fn() once for all concurrent callers with the same key.
+    # Returns (result, shared); shared is True for callers that didn't make
+    # the call themselves. Waiters give up after timeout seconds (TimeoutError).
+    def do(self, key, fn, timeout=None):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            if not call.done.wait(timeout):
+                raise TimeoutError(f"gave up waiting {timeout}s for a shared in-flight call")
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    # Async version of do: make_coro() is only called by the leader. The call
+    # runs as its own task, so a caller that is cancelled (say by a fan-out
+    # deadline) doesn't cancel it for the others. Calls are shared within one
+    # event loop.
+    async def ado(self, key, make_coro):
+        loop = asyncio.get_running_loop()
+        task_key = (loop, key)
+        task = self._tasks.get(task_key)
+        shared = task is not None
+        if not shared:
+            task = loop.create_task(make_coro())
+            self._tasks[task_key] = task
+            task.add_done_callback(lambda done: self._tasks.pop(task_key, None))
+        return await asyncio.shield(task), shared
@@ -0,0 +1,67 @@
+# Lazily opened SQLite file for the persistent stores
+# The geocode store, the Wikipedia sentence store, the movie snapshot and the
+# recipe index each keep a small SQLite file in data/ next to the app.
+# SQLiteStore holds the part they share: the database is opened (and its
+# tables created) on first use, so importing the app stays side-effect free,
+# and one connection is shared by every thread behind a lock. Subclasses only
+# list their SCHEMA and write their queries.
+import contextlib
+import os
+import sqlite3
+import threading
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+
+# Function to get a store's database path: env_var if set, else data/filename
+def data_path(env_var, filename):
+    return os.getenv(env_var, os.path.join(DATA_DIR, filename))
+
+
+class SQLiteStore:
+    SCHEMA = ()  # CREATE TABLE IF NOT EXISTS statements, run when the database is opened
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = None
+        self._lock = threading.RLock()
+
+    # Must be called with the lock held
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            for statement in self.SCHEMA:
+                self._conn.execute(statement)
+            self._conn.commit()
+        return self._conn
+
+    # Function to run a read query and return all its rows
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._connect().execute(sql, params).fetchall()
+
+    # Context manager for writes: yields the connection and commits once the
+    # block finishes, or rolls everything in it back if the block raises
+    @contextlib.contextmanager
+    def _writing(self):
+        with self._lock:
+            conn = self._connect()
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+
+    # Function to run one write statement
+    def _write(self, sql, params=()):
+        with self._writing() as conn:
+            conn.execute(sql, params)
+
+    # Function to close the database (it is opened again on next use)
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,336 @@
+# Shared HTTP client for every upstream API
+# All API calls go through one requests.Session. Its connection pool keeps
+# connections to each host alive between calls, so we only pay the TCP + TLS
+# handshake once per connection instead of once per call. The client also
+# sets default connect/read timeouts, so no call can hang a worker forever.
+# Idempotent requests (GET/HEAD) that hit connection errors or 429/5xx
+# responses are retried a couple of times with exponential backoff.
+# Every call is timed and counted per provider (see metrics.py).
+# Identical GETs made at the same time share one in-flight request
+# (see singleflight.py), so a burst of users asking the same thing costs the
+# upstream API (and our quota) a single call. Within one chat answer a repeat
+# of a call already made is answered from the answer's memo (see request_scope.py).
+#
+# Fetch functions are written once, as generators that yield request(...)
+# specs and get responses sent back (see @fetcher below). The same function
+# then runs synchronously through the pooled session, or on an event loop
+# through httpx (await fn.aio(...)), without duplicating any parsing code.
+# The async pipeline has one event loop for the whole process (see
+# run_on_loop) with one long-lived httpx client, so every message shares its
+# connections and identical in-flight calls coalesce across messages.
+import asyncio
+import functools
+import os
+import threading
+import time
+from collections import namedtuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import metrics
+import request_scope
+from background import BackgroundWorker
+from singleflight import SingleFlight
+
+# httpx is optional: without it the async path runs requests on worker threads
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+# (connect, read) timeouts in seconds, used when a caller doesn't pass its own
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = 10
+DEFAULT_TIMEOUT = (CONNECT_TIMEOUT, READ_TIMEOUT)
+
+# Pool sizing: one pool per host (we talk to about a dozen hosts) and enough
+# connections per host for every fan-out worker to have one
+POOL_HOSTS = 16
+POOL_CONNECTIONS_PER_HOST = 32
+
+# Send every upstream call to another server instead (e.g. the offline stub in
+# benchmarks/stub_server.py). https://api.themoviedb.org/3/movie/popular then
+# becomes {ACTIVABOT_UPSTREAM_URL}/api.themoviedb.org/3/movie/popular.
+UPSTREAM_OVERRIDE = os.getenv("ACTIVABOT_UPSTREAM_URL")
+
+# Upstream host -> provider name used in metrics
+PROVIDERS = {
+    "api.themoviedb.org": "tmdb",
+    "www.omdbapi.com": "omdb",
+    "app.ticketmaster.com": "ticketmaster",
+    "api.geoapify.com": "geoapify",
+    "api.openbrewerydb.org": "openbrewerydb",
+    "www.themealdb.com": "themealdb",
+    "www.googleapis.com": "google_books",
+    "openlibrary.org": "openlibrary",
+    "en.wikipedia.org": "wikipedia",
+    "v2.jokeapi.dev": "jokeapi",
+}
+
+RETRY = Retry(
+    total=2,
+    connect=2,
+    read=1,
+    status=2,
+    backoff_factor=0.3,  # waits 0.3s, then 0.6s between attempts
+    status_forcelist=(429, 500, 502, 503, 504),
+    allowed_methods=frozenset({"GET", "HEAD"}),
+    # A long Retry-After would stall the chat response, so back off on our own schedule
+    respect_retry_after_header=False,
+    raise_on_status=False,
+)
+
+
+# Function to build a session with pooled adapters for http and https
+def new_session(retry=RETRY):
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=POOL_HOSTS,
+        pool_maxsize=POOL_CONNECTIONS_PER_HOST,
+        max_retries=retry,
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+SESSION = new_session()
+# For calls that must fit a time budget: a retry would double their worst case
+SESSION_NO_RETRY = new_session(retry=0)
+
+
+# Function to point a URL at UPSTREAM_OVERRIDE, when one is set
+def resolve(url):
+    if not UPSTREAM_OVERRIDE:
+        return url
+    parts = urlsplit(url)
+    query = f"?{parts.query}" if parts.query else ""
+    return f"{UPSTREAM_OVERRIDE.rstrip('/')}/{parts.netloc}{parts.path}{query}"
+
+
+# Function to name the provider behind a URL (its host if we don't know it)
+def provider_name(url):
+    host = urlsplit(url).netloc
+    return PROVIDERS.get(host, host)
+
+
+# Identical upstream GETs currently in flight
+IN_FLIGHT = SingleFlight()
+
+
+# Function to build the key under which identical calls are shared
+def _flight_key(url, params, headers):
+    return (
+        url,
+        tuple(sorted((params or {}).items())),
+        tuple(sorted((headers or {}).items())),
+    )
+
+
+# Function to count a caller that got its response from someone else's call
+def _record_shared(url, shared):
+    if shared:
+        metrics.UPSTREAM_COALESCED.inc(provider=provider_name(url), intent=metrics.CURRENT_INTENT.get())
+
+
+# Function to answer a call from the current answer's memo. Returns (found, response).
+def _memo_lookup(key, url):
+    scope = request_scope.current()
+    if scope is None:
+        return False, None
+    found, response = scope.lookup(key)
+    if found:
+        metrics.REQUEST_MEMO_HITS.inc(provider=provider_name(url), intent=metrics.CURRENT_INTENT.get())
+    return found, response
+
+
+# Function to remember a response in the current answer's memo
+def _memo_store(key, url, response):
+    scope = request_scope.current()
+    if scope is not None:
+        scope.store(key, response, provider_name(url))
+
+
+# Function to GET an upstream URL through the shared pool
+def get(url, params=None, headers=None, timeout=None, retry=True):
+    key = _flight_key(url, params, headers)
+    found, response = _memo_lookup(key, url)
+    if found:
+        return response
+    timeout = timeout or DEFAULT_TIMEOUT
+    # Waiting on someone else's call gets the same overall limit as making it
+    wait_limit = sum(timeout) if isinstance(timeout, tuple) else timeout
+    try:
+        response, shared = IN_FLIGHT.do(key, lambda: _send(url, params, headers, timeout, retry), timeout=wait_limit)
+    except TimeoutError as e:
+        raise requests.Timeout(str(e)) from e
+    _record_shared(url, shared)
+    _memo_store(key, url, response)
+    return response
+
+
+# Function to make one GET through the pooled session and record it in metrics
+def _send(url, params, headers, timeout, retry):
+    session = SESSION if retry else SESSION_NO_RETRY
+    started = time.perf_counter()
+    try:
+        response = session.get(resolve(url), params=params, headers=headers, timeout=timeout)
+    except requests.Timeout:
+        metrics.record_upstream(provider_name(url), time.perf_counter() - started, reason="timeout")
+        raise
+    except Exception:
+        metrics.record_upstream(provider_name(url), time.perf_counter() - started, reason="error")
+        raise
+    metrics.record_upstream(provider_name(url), time.perf_counter() - started, status=response.status_code)
+    return response
+
+
+# One upstream call, as yielded by a fetcher
+Request = namedtuple("Request", ["url", "params", "headers", "timeout", "retry"])
+
+
+# Function to describe a GET for a fetcher to yield
+def request(url, params=None, headers=None, timeout=None, retry=True):
+    return Request(url, params, headers, timeout, retry)
+
+
+# Function to drive a fetcher generator: send each response back in, or throw
+# the error in so the fetcher's own try/except can handle it
+def _advance(steps, response=None, error=None):
+    try:
+        if error is not None:
+            return False, steps.throw(error)
+        return False, steps.send(response)
+    except StopIteration as done:
+        return True, done.value
+
+
+# Function to run a fetcher generator synchronously through the pooled session
+def run(steps):
+    finished, value = _advance(steps)
+    while not finished:
+        try:
+            response = get(*value)
+        except Exception as e:
+            finished, value = _advance(steps, error=e)
+        else:
+            finished, value = _advance(steps, response)
+    return value
+
+
+# The process-wide event loop for the async pipeline and its httpx client,
+# both made by the loop thread when it starts (see run_on_loop)
+_EVENT_LOOP = None
+_ASYNC_CLIENT = None
+_LOOP_READY = threading.Event()
+
+
+# Function to convert a requests-style timeout ((connect, read) or seconds) for httpx
+def _httpx_timeout(timeout):
+    timeout = timeout or DEFAULT_TIMEOUT
+    if isinstance(timeout, tuple):
+        return httpx.Timeout(timeout[1], connect=timeout[0])
+    return httpx.Timeout(timeout)
+
+
+def _run_event_loop():
+    global _EVENT_LOOP, _ASYNC_CLIENT
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    if httpx is not None:
+        limits = httpx.Limits(max_connections=POOL_HOSTS * POOL_CONNECTIONS_PER_HOST,
+                              max_keepalive_connections=POOL_CONNECTIONS_PER_HOST)
+        transport = httpx.AsyncHTTPTransport(retries=RETRY.total, limits=limits)
+        _ASYNC_CLIENT = httpx.AsyncClient(transport=transport)
+    _EVENT_LOOP = loop
+    _LOOP_READY.set()
+    loop.run_forever()
+
+
+# The loop thread starts with the first async message, not at import
+_LOOP_WORKER = BackgroundWorker(_run_event_loop, "upstream-loop", essential=True)
+
+
+# Function to run a coroutine on the shared event loop from any thread and wait for its result
+def run_on_loop(coro, timeout=None):
+    _LOOP_WORKER.start()
+    _LOOP_READY.wait()
+    return asyncio.run_coroutine_threadsafe(coro, _EVENT_LOOP).result(timeout)
+
+
+# Function to GET an upstream URL without blocking the event loop
+# (httpx only retries failed connects, so retry makes no difference here)
+async def aget(url, params=None, headers=None, timeout=None, retry=True):
+    # The httpx client belongs to the shared loop; anywhere else (or without
+    # httpx) the call goes through the pooled session on a worker thread
+    if httpx is None or asyncio.get_running_loop() is not _EVENT_LOOP:
+        return await asyncio.to_thread(get, url, params, headers, timeout, retry)
+    if params:
+        # requests leaves out None-valued params; httpx would send them empty
+        params = {key: value for key, value in params.items() if value is not None}
+    key = _flight_key(url, params, headers)
+    found, response = _memo_lookup(key, url)
+    if found:
+        return response
+    response, shared = await IN_FLIGHT.ado(key, lambda: _asend(url, params, headers, timeout))
+    _record_shared(url, shared)
+    _memo_store(key, url, response)
+    return response
+
+
+# Function to make one GET through httpx and record it in metrics
+async def _asend(url, params, headers, timeout):
+    started = time.perf_counter()
+    try:
+        response = await _ASYNC_CLIENT.get(resolve(url), params=params, headers=headers,
+                                           timeout=_httpx_timeout(timeout))
+    except httpx.TimeoutException:
+        metrics.record_upstream(provider_name(url), time.perf_counter() - started, reason="timeout")
+        raise
+    except Exception:
+        metrics.record_upstream(provider_name(url), time.perf_counter() - started, reason="error")
+        raise
+    metrics.record_upstream(provider_name(url), time.perf_counter() - started, status=response.status_code)
+    return response
+
+
+# Function to run a fetcher generator on the event loop
+async def arun(steps):
+    finished, value = _advance(steps)
+    while not finished:
+        try:
+            response = await aget(*value)
+        except Exception as e:
+            finished, value = _advance(steps, error=e)
+        else:
+            finished, value = _advance(steps, response)
+    return value
+
+
+# Decorator for fetch functions written as request-yielding generators.
+# fn(...) runs it synchronously, await fn.aio(...) runs it async, and
+# yield from fn.steps(...) lets one fetcher reuse another.
+def fetcher(steps_fn):
+    @functools.wraps(steps_fn)
+    def sync(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return run(steps_fn(*args, **kwargs))
+        finally:
+            metrics.FETCHER_SECONDS.observe(time.perf_counter() - started, fetcher=steps_fn.__name__,
+                                            intent=metrics.CURRENT_INTENT.get())
+
+    async def aio(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await arun(steps_fn(*args, **kwargs))
+        finally:
+            metrics.FETCHER_SECONDS.observe(time.perf_counter() - started, fetcher=steps_fn.__name__,
+                                            intent=metrics.CURRENT_INTENT.get())
+
+    sync.aio = aio
+    sync.steps = steps_fn
+    return sync
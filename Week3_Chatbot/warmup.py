@@ -0,0 +1,49 @@
+# Optional upstream warm-up / connectivity self-check
+# Importing the app never touches the network. If you want a self-check, call
+# start_warmup() (app.py does when ACTIVABOT_WARMUP=1). It pings each upstream
+# API once on a background thread and records the result in UPSTREAM_HEALTH.
+# That also opens pooled keep-alive connections, so the first real chat
+# message doesn't pay the handshakes. Readiness never waits on it.
+import threading
+import time
+
+import upstream
+
+# name -> {"ok", "status", "latency_ms", "error", "checked_at"}, filled in as checks finish
+UPSTREAM_HEALTH = {}
+
+# Short timeouts: a dead host should be reported quickly, not waited on
+WARMUP_TIMEOUT = (2, 4)
+
+_started = threading.Event()
+
+
+# Function to check one upstream: (url, params) -> health record
+def check_upstream(url, params=None):
+    started = time.monotonic()
+    record = {"ok": False, "status": None, "latency_ms": None, "error": None}
+    try:
+        response = upstream.get(url, params=params, timeout=WARMUP_TIMEOUT)
+        record["status"] = response.status_code
+        record["ok"] = response.status_code < 500
+    except Exception as e:
+        record["error"] = str(e)
+    record["latency_ms"] = round((time.monotonic() - started) * 1000, 1)
+    record["checked_at"] = time.time()
+    return record
+
+
+# Function to run every check (name -> (url, params)) and store the results
+def run_checks(checks):
+    for name, (url, params) in checks.items():
+        UPSTREAM_HEALTH[name] = check_upstream(url, params)
+        status = "ok" if UPSTREAM_HEALTH[name]["ok"] else "DOWN"
+        print(f"Upstream self-check: {name} {status} ({UPSTREAM_HEALTH[name]['latency_ms']} ms)")
+
+
+# Function to start the self-check on a daemon thread (only the first call does anything)
+def start_warmup(checks):
+    if _started.is_set():
+        return
+    _started.set()
+    threading.Thread(target=run_checks, args=(checks,), name="upstream-warmup", daemon=True).start()
@@ -0,0 +1,68 @@
+# Persistent Wikipedia sentence store
+# get_wiki_fact only ever shows one sentence of a topic's summary, but it used
+# to download the whole summary and split it into sentences on every call.
+# This store keeps the already split sentences per topic in a small SQLite
+# file next to the app, so a repeat topic is a random.choice with no network
+# call and no regex work. Summaries change rarely, so entries live for a week.
+# Topics Wikipedia has no page for (404) are remembered for a day.
+import json
+import time
+
+from sqlite_store import SQLiteStore, data_path
+
+WIKI_DB_PATH = data_path("WIKI_DB_PATH", "wiki.sqlite3")
+
+TTL = 7 * 24 * 3600
+NEGATIVE_TTL = 24 * 3600
+
+
+# Function to turn a topic ("New_York", "new york ") into its store key
+def normalize_topic(topic):
+    return " ".join(topic.replace("_", " ").lower().split())
+
+
+class WikiSentenceStore(SQLiteStore):
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS wiki_sentences ("
+        " topic TEXT PRIMARY KEY,"
+        " sentences TEXT,"
+        " updated_at REAL NOT NULL)",
+    )
+
+    def __init__(self, path=WIKI_DB_PATH):
+        super().__init__(path)
+        self._memory = {}  # key -> (sentences or None, updated_at)
+
+    # Look up a topic. Returns (found, sentences); a remembered 404 is found
+    # with None. Expired entries are not found.
+    def get(self, topic):
+        key = normalize_topic(topic)
+        entry = self._memory.get(key)
+        if entry is None:
+            rows = self._query("SELECT sentences, updated_at FROM wiki_sentences WHERE topic = ?", (key,))
+            if not rows:
+                return False, None
+            row = rows[0]
+            entry = (json.loads(row[0]) if row[0] is not None else None, row[1])
+            self._memory[key] = entry
+        sentences, updated_at = entry
+        ttl = TTL if sentences is not None else NEGATIVE_TTL
+        if time.time() - updated_at > ttl:
+            return False, None
+        return True, sentences
+
+    # Save a topic's sentences (None records that Wikipedia has no page for it)
+    def put(self, topic, sentences):
+        key = normalize_topic(topic)
+        updated_at = time.time()
+        self._write(
+            "INSERT OR REPLACE INTO wiki_sentences (topic, sentences, updated_at) VALUES (?, ?, ?)",
+            (key, json.dumps(sentences) if sentences is not None else None, updated_at),
+        )
+        self._memory[key] = (sentences, updated_at)
+
+    # Forget every stored topic (memory and disk)
+    def clear(self):
+        with self._writing() as conn:
+            conn.execute("DELETE FROM wiki_sentences")
+            self._memory.clear()